@@ -0,0 +1,60 @@
+"""measure the event loop lag while loading a large result into models
+
+usage: python -m benchmarks.hydration [rows]
+"""
+import asyncio
+import sys
+import time
+
+import cherry
+
+db = cherry.Database("sqlite+aiosqlite:///:memory:")
+
+
+class Item(cherry.Model):
+    id: cherry.AutoIntPK = None
+    name: str
+    score: int
+
+    cherry_config = cherry.CherryConfig(tablename="item", database=db)
+
+
+async def measure_lag(stop: asyncio.Event, interval: float = 0.001) -> float:
+    """the longest delay of a periodic timer, i.e. how long the loop was blocked"""
+    max_lag = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        max_lag = max(max_lag, time.perf_counter() - start - interval)
+    return max_lag
+
+
+async def run(name: str, chunk_size, offload: str):
+    Item.__meta__.hydration_chunk_size = chunk_size
+    Item.__meta__.hydration_offload = offload  # type: ignore
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_lag(stop))
+    await asyncio.sleep(0.01)
+    start = time.perf_counter()
+    await Item.all()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    max_lag = await lag_task
+    print(  # noqa: T201
+        f"{name:<24}{elapsed * 1000:>10.2f} ms total{max_lag * 1000:>10.2f} ms max lag",
+    )
+
+
+async def main(rows: int):
+    await db.init()
+    await Item.insert_many(*(Item(name=f"item {i}", score=i) for i in range(rows)))
+    print(f"rows={rows}")  # noqa: T201
+    await run("at once", None, "yield")
+    await run("yield every 2000", 2000, "yield")
+    await run("yield every 500", 500, "yield")
+    await run("thread every 2000", 2000, "thread")
+    await db.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 50_000))
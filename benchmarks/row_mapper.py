@@ -0,0 +1,51 @@
+"""compare building result dicts with Row._asdict() and the compiled RowMapper
+
+usage: python -m benchmarks.row_mapper [rows]
+"""
+import asyncio
+import sys
+import time
+import tracemalloc
+
+import cherry
+
+db = cherry.Database("sqlite+aiosqlite:///:memory:")
+
+
+class Item(cherry.Model):
+    id: cherry.AutoIntPK = None
+    name: str
+    score: int
+    weight: float = 1.0
+
+    cherry_config = cherry.CherryConfig(tablename="item", database=db)
+
+
+def measure(name: str, func_, rows):
+    tracemalloc.start()
+    start = time.perf_counter()
+    func_(rows)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<16}{elapsed * 1000:>10.2f} ms{peak / 1024:>12.0f} KiB peak")  # noqa: T201
+
+
+async def main(count: int):
+    await db.init()
+    await Item.insert_many(*(Item(name=f"item {i}", score=i) for i in range(count)))
+    async with db as conn:
+        rows = (await conn.execute(Item.table.select())).fetchall()
+    mapper = Item.__meta__.row_mapper
+
+    print(f"rows={count}")  # noqa: T201
+    measure("Row._asdict", lambda rows: [row._asdict() for row in rows], rows)
+    measure("RowMapper", lambda rows: mapper.map_rows(mapper.keys, rows), rows)
+    start = time.perf_counter()
+    await Item.all()
+    print(f"{'Item.all':<16}{(time.perf_counter() - start) * 1000:>10.2f} ms")  # noqa: T201
+    await db.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000))
@@ -0,0 +1,86 @@
+"""compare random sampling strategies
+
+usage: python -m benchmarks.sample [rows] [n]
+"""
+import asyncio
+import random
+import sys
+import time
+
+import cherry
+from cherry.queryset.sample import (
+    _sample_by_pk_probe,
+    _sample_by_random_order,
+    _sample_by_reservoir,
+)
+
+from sqlalchemy import func
+
+db = cherry.Database("sqlite+aiosqlite:///:memory:")
+
+
+class Item(cherry.Model):
+    id: cherry.AutoIntPK = None
+    name: str
+    score: int
+
+    cherry_config = cherry.CherryConfig(tablename="item", database=db)
+
+
+async def timeit(name: str, func_, repeat: int = 5):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        await func_()
+    print(f"{name:<24}{(time.perf_counter() - start) / repeat * 1000:>10.2f} ms")  # noqa: T201
+
+
+async def main(rows: int, n: int):
+    await db.init()
+    rng = random.Random(0)
+    items = [Item(name=f"item {i}", score=rng.randrange(1000)) for i in range(rows)]
+    for i in range(0, rows, 10000):
+        await Item.insert_many(*items[i : i + 10000])
+
+    queryset = Item.select()
+    table = Item.table
+    select_stat = queryset._build_select()
+
+    async def order_by_random():
+        async with db as conn:
+            # the old random_one: unbounded ORDER BY random() and fetchone
+            result = await conn.execute(select_stat.order_by(func.random()))
+            result.fetchone()
+
+    async def bounded_order_by_random():
+        async with db as conn:
+            await _sample_by_random_order(conn, select_stat, n)
+
+    async def pk_probe():
+        async with db as conn:
+            rows = await _sample_by_pk_probe(
+                conn,
+                table,
+                queryset.options,
+                select_stat,
+                n,
+                rng,
+            )
+            assert rows is not None and len(rows) == n
+
+    async def reservoir():
+        async with db as conn:
+            await _sample_by_reservoir(conn, select_stat, n, rng)
+
+    print(f"rows={rows} n={n}")  # noqa: T201
+    await timeit("ORDER BY random()", order_by_random)
+    await timeit("ORDER BY random() LIMIT", bounded_order_by_random)
+    await timeit("primary key probing", pk_probe)
+    await timeit("reservoir over stream", reservoir)
+    await timeit("QuerySet.sample", lambda: Item.sample(n))
+    await db.dispose()
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    asyncio.run(main(rows, n))
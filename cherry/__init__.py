@@ -17,6 +17,12 @@ from .meta import (
     CompositeIndex as CompositeIndex,
 )
 from .models import Model as Model
+from .queryset import (
+    CountResult as CountResult,
+    Prefetch as Prefetch,
+    QueryPlan as QueryPlan,
+    Record as Record,
+)
 from .typing import (
     CASCADE as CASCADE,
     NO_ACTION as NO_ACTION,
@@ -56,3 +56,7 @@ class PaginateArgError(ValueError, CherryException):
 
 class ClauseTypeError(TypeError, CherryException):
     """The clause type is not correct."""
+
+
+class DialectNotSupportedError(NotImplementedError, CherryException):
+    """The database dialect does not support the operation."""
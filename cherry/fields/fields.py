@@ -157,7 +157,7 @@ def Field(
     union_mode: Literal["smart", "left_to_right"] = _Unset,
     **extra: Unpack[_EmptyKwargs],
 ) -> Any:
-    if primary_key:
+    if primary_key is not _Unset and primary_key:
         nullable = False
     field_info = BaseField.from_pydantic_field_info(
         PydanticField(
@@ -17,10 +17,11 @@ from .fields import (
     ManyToManyField,
     ReverseRelationshipField,
 )
+from .utils import args_and_kwargs_to_clause_list
 
 from khemia.utils import create_nested_dict
 from pydantic import BaseModel
-from sqlalchemy import BinaryExpression, Column, ColumnElement, JSON
+from sqlalchemy import BinaryExpression, Column, ColumnElement, Exists, JSON, select
 
 if TYPE_CHECKING:
     from cherry.models import Model
@@ -134,6 +135,53 @@ class RelatedModelProxy:
             )
         return getattr(self.model, self.field.foreign_key_self_name)
 
+    def any(self, *args: Any, **kwargs: Any) -> ColumnElement[bool]:
+        """filter models having at least one related model matching the given
+        condition, compiled to an EXISTS subquery"""
+        return self._get_exists(*args, **kwargs)
+
+    def none(self, *args: Any, **kwargs: Any) -> ColumnElement[bool]:
+        """filter models having no related model matching the given
+        condition, compiled to a NOT EXISTS subquery"""
+        return ~self._get_exists(*args, **kwargs)
+
+    def _get_exists(self, *args: Any, **kwargs: Any) -> Exists:
+        table = self.model.__meta__.table
+        related_table = self.related_model.__meta__.table
+        if isinstance(self.field, ForeignKeyField):
+            stat = select(1).where(
+                related_table.c[self.field.foreign_key]
+                == table.c[self.field.foreign_key_self_name],
+            )
+        elif isinstance(self.field, ReverseRelationshipField):
+            stat = select(1).where(
+                related_table.c[self.field.related_field.foreign_key_self_name]
+                == table.c[self.field.related_field.foreign_key],
+            )
+        else:
+            m2m_table = self.field.table
+            stat = (
+                select(1)
+                .select_from(
+                    m2m_table.join(
+                        related_table,
+                        related_table.c[self.field.related_field.m2m_field_name]
+                        == m2m_table.c[self.field.related_field.m2m_table_field_name],
+                    ),
+                )
+                .where(
+                    m2m_table.c[self.field.m2m_table_field_name]
+                    == table.c[self.field.m2m_field_name],
+                )
+            )
+        for clause in args_and_kwargs_to_clause_list(self.related_model, args, kwargs):
+            stat = stat.where(
+                clause.binary_expression
+                if isinstance(clause, ModelClauseBase)
+                else clause,
+            )
+        return stat.exists()
+
 
 class JsonFieldClause(ModelClauseBase):
     def __init__(
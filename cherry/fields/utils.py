@@ -1,9 +1,14 @@
-from functools import reduce
+from collections.abc import Iterable
+from functools import cache, reduce
+from typing import Callable, Optional, Union
 
-from cherry.typing import ClauseListType, DictStrAny, ModelType, TupleAny
+from cherry.exception import FieldTypeError
+from cherry.typing import AnyMapping, ClauseListType, DictStrAny, ModelType, TupleAny
 
 import pydantic
-from sqlalchemy import Column
+from sqlalchemy import Column, ColumnElement, Table
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine.interfaces import Dialect
 from sqlalchemy.sql import operators as sa_op
 
 operator_mapping = {
@@ -66,6 +71,46 @@ def args_and_kwargs_to_clause_list(
     return column_elements
 
 
+def split_column_expressions(
+    input_data: DictStrAny,
+) -> tuple[DictStrAny, dict[str, ColumnElement]]:
+    """split input data into literal values and sql expressions,
+    e.g. `money=User.money + 10` is kept as an expression"""
+    values, expressions = {}, {}
+    for k, v in input_data.items():
+        if isinstance(v, ColumnElement):
+            expressions[k] = v
+        else:
+            values[k] = v
+    return values, expressions
+
+
+def merge_update_values(
+    model: ModelType,
+    values: Optional[AnyMapping],
+    kwargs: DictStrAny,
+    given_options: Iterable[str],
+) -> DictStrAny:
+    """merge the update values given as a mapping (keyed by field name or Column)
+    with the ones given as keyword arguments
+
+    an option given by keyword such as `returning` or `progress` which is also
+    a field of model is ambiguous without the mapping, so it raises
+    """
+    if values is None and (clash := set(given_options) & model.model_fields.keys()):
+        raise FieldTypeError(
+            f"{model.__name__} has fields named like the update options {clash},"
+            " pass the values as a dict, e.g. `update({...})`",
+        )
+    return {
+        **{
+            (k.name if isinstance(k, Column) else k): v
+            for k, v in (values or {}).items()
+        },
+        **kwargs,
+    }
+
+
 def validate_fields(
     model: ModelType,
     input_data: DictStrAny,
@@ -73,11 +118,43 @@ def validate_fields(
     if miss := set(input_data) - set(model.model_fields):
         raise ValueError(f"{model.__name__} has no fields: {miss}")
 
+    input_data, expressions = split_column_expressions(input_data)
+    validator = get_fields_validator(model, frozenset(input_data))
+    return {**validator.model_validate(input_data).model_dump(), **expressions}
+
+
+@cache
+def get_fields_validator(
+    model: ModelType,
+    field_names: frozenset[str],
+) -> type[pydantic.BaseModel]:
+    """create a pydantic model which only validates the given fields of model,
+    cached per model and field set"""
     fields = {
-        k: (v.annotation, v) for k, v in model.model_fields.items() if k in input_data
+        k: (v.annotation, v) for k, v in model.model_fields.items() if k in field_names
     }
-    new_model: type[pydantic.BaseModel] = pydantic.create_model(
+    return pydantic.create_model(
         model.__name__,
         **fields,  # type: ignore
     )
-    return new_model.model_validate(input_data).model_dump()
+
+
+@cache
+def get_list_adapter(model: type[pydantic.BaseModel]) -> pydantic.TypeAdapter:
+    """create a TypeAdapter validating a list of model in one call,
+    cached per model (or per fields validator of a projection)"""
+    return pydantic.TypeAdapter(list[model])  # type: ignore
+
+
+def get_upsert_insert(
+    dialect: Dialect,
+) -> Optional[Callable[[Table], Union[postgresql.Insert, sqlite.Insert]]]:
+    """get the dialect specific insert construct which supports
+    `ON CONFLICT` with `RETURNING`, None if the dialect does not support it"""
+    if not (dialect.insert_returning and dialect.update_returning):
+        return None
+    if dialect.name == "postgresql":
+        return postgresql.insert
+    if dialect.name == "sqlite":
+        return sqlite.insert
+    return None
@@ -1,3 +1,5 @@
+from collections.abc import Iterator, Sequence
+
 from cherry.typing import T
 
 from sqlalchemy import Column
@@ -10,6 +12,15 @@ def cast_column(arg: T) -> Column[T]:
     return arg
 
 
+def chunked(items: Sequence[T], size: int) -> Iterator[Sequence[T]]:
+    """split a sequence into chunks of the given size"""
+    if size < 1:
+        raise ValueError("chunk size must be positive")
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
 __all__ = [
     "cast_column",
+    "chunked",
 ]
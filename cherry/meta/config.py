@@ -1,5 +1,5 @@
 from dataclasses import dataclass, field
-from typing import Any, cast, TypedDict
+from typing import Any, cast, Literal, Optional, TypedDict
 
 from cherry.database import Database
 from cherry.fields.fields import (
@@ -9,6 +9,7 @@ from cherry.fields.fields import (
 )
 
 from .index import CompositeIndex
+from .mapper import RowMapper
 
 from khemia.utils import classproperty
 from pydantic import ConfigDict
@@ -24,6 +25,8 @@ class CherryConfig(TypedDict, total=False):
     indexes: list[CompositeIndex]
     use_jsonb_in_postgres: bool
     use_array_in_postgres: bool
+    hydration_chunk_size: Optional[int]
+    hydration_offload: Literal["yield", "thread"]
 
 
 @dataclass
@@ -31,12 +34,17 @@ class CherryMeta:
     tablename: str
     database: Database = field(init=False)
     table: Table = field(init=False)
+    row_mapper: RowMapper = field(init=False)
     metadata: MetaData = field(init=False)
     abstract: bool = False
     constraints: list[ColumnCollectionConstraint] = field(default_factory=list)
     indexes: list[CompositeIndex] = field(default_factory=list)
     use_jsonb_in_postgres: bool = True
     use_array_in_postgres: bool = True
+    # results longer than this are parsed into models chunk by chunk, yielding
+    # to the event loop or running in a worker thread, None parses them at once
+    hydration_chunk_size: Optional[int] = 2000
+    hydration_offload: Literal["yield", "thread"] = "yield"
     columns: dict[str, Column] = field(default_factory=dict)
     primary_key: tuple[str, ...] = field(default_factory=tuple)
     related_fields: dict[str, ForeignKeyField] = field(default_factory=dict)
@@ -0,0 +1,43 @@
+from collections.abc import Iterable, Sequence
+from typing import Any, Callable
+
+from sqlalchemy import Table
+
+MapRow = Callable[[Sequence[Any]], dict[str, Any]]
+
+
+def compile_row_mapper(keys: tuple[str, ...]) -> MapRow:
+    """compile a function building the dict of a row from its positions,
+    which avoids the key lookups and intermediate objects of `Row._asdict()`"""
+    items = ", ".join(f"{key!r}: row[{i}]" for i, key in enumerate(keys))
+    namespace: dict[str, Any] = {}
+    exec(f"def map_row(row):\n    return {{{items}}}\n", namespace)  # noqa: S102
+    return namespace["map_row"]
+
+
+class RowMapper:
+    """map result rows of a model to dicts keyed by column name,
+    built when the table of the model is generated
+
+    the mapper of the full table row is compiled up front, the ones of other
+    column layouts (e.g. `only` or prefetch rows) on first use
+    """
+
+    def __init__(self, table: Table) -> None:
+        self.keys = tuple(column.name for column in table.c)
+        self.map_row = compile_row_mapper(self.keys)
+        self._mappers: dict[tuple[str, ...], MapRow] = {self.keys: self.map_row}
+
+    def get(self, keys: Iterable[str]) -> MapRow:
+        keys = tuple(keys)
+        if (map_row := self._mappers.get(keys)) is None:
+            map_row = self._mappers[keys] = compile_row_mapper(keys)
+        return map_row
+
+    def map_rows(
+        self,
+        keys: Iterable[str],
+        rows: Iterable[Sequence[Any]],
+    ) -> list[dict[str, Any]]:
+        map_row = self.get(keys)
+        return [map_row(row) for row in rows]
@@ -1,4 +1,5 @@
 import asyncio
+from collections.abc import Iterable, Sequence
 from functools import reduce
 from typing import (
     Any,
@@ -23,12 +24,23 @@ from cherry.fields.fields import (
 )
 from cherry.fields.proxy import JsonFieldProxy, RelatedModelProxy
 from cherry.fields.types import get_sqlalchemy_type_from_field
+from cherry.fields.utils import (
+    get_fields_validator,
+    get_list_adapter,
+    get_upsert_insert,
+    merge_update_values,
+    split_column_expressions,
+    validate_fields,
+)
+from cherry.helpers import chunked
 from cherry.meta.config import (
     CherryConfig,
     CherryMeta,
     default_pydantic_config,
     generate_cherry_config,
 )
+from cherry.meta.mapper import RowMapper
+from cherry.queryset.lazy import get_relation_name, SiblingGroup
 from cherry.queryset.queryset import QuerySet
 from cherry.typing import AnyMapping, DictStrAny
 
@@ -39,15 +51,37 @@ from khemia.typing import (
     is_sequence_type,
 )
 from khemia.utils import classproperty
-from pydantic import PrivateAttr
+from pydantic import PrivateAttr, ValidationError
 from pydantic._internal._generics import PydanticGenericMetadata
 from pydantic._internal._model_construction import ModelMetaclass
 from pydantic.fields import _Unset, FieldInfo
 from pydantic.main import BaseModel
-from sqlalchemy import Column, ForeignKey, Index, MetaData, Table
+from sqlalchemy import (
+    Boolean,
+    case,
+    Column,
+    ForeignKey,
+    Index,
+    literal,
+    literal_column,
+    MetaData,
+    PrimaryKeyConstraint,
+    Row,
+    select,
+    Table,
+    tuple_,
+    UniqueConstraint,
+)
+from sqlalchemy.ext.asyncio import AsyncConnection
 from sqlalchemy.sql.elements import ColumnElement
 from sqlalchemy.sql.operators import and_
 
+# label of the RETURNING column telling an upserted row was inserted
+_INSERTED = "_cherry_inserted_"
+# bind parameters of one bulk statement, below the limits of sqlite (32766)
+# and asyncpg (32767)
+MAX_BIND_PARAMS = 30000
+
 
 @dataclass_transform(kw_only_default=True, field_specifiers=(Field, Relationship))
 class ModelMeta(ModelMetaclass):
@@ -89,6 +123,9 @@ class ModelMeta(ModelMetaclass):
         cls.__meta__ = CherryMeta(
             tablename=cls.cherry_config.get("tablename") or cls_name,
         )
+        for key in ("hydration_chunk_size", "hydration_offload"):
+            if key in cls.cherry_config:
+                setattr(cls.__meta__, key, cls.cherry_config[key])
         if (abstract := cls.cherry_config.get("abstract")) is not None:
             cls.__meta__.abstract = abstract
         if (database := cls.cherry_config.get("database")) is not None:
@@ -128,8 +165,14 @@ class Model(BaseModel, metaclass=ModelMeta):
 
     if TYPE_CHECKING:
         _cherry_foreign_key_values_: DictStrAny = Field(init=False)
+        _cherry_siblings_: Optional[SiblingGroup] = Field(init=False)
+        _cherry_partial_: bool = Field(init=False)
     else:
         _cherry_foreign_key_values_: DictStrAny = PrivateAttr(default_factory=dict)
+        # the models queried together with this one by `lazy_related()`
+        _cherry_siblings_: Optional[SiblingGroup] = PrivateAttr(default=None)
+        # queried with only some columns, e.g. by `only()`
+        _cherry_partial_: bool = PrivateAttr(default=False)
 
     @classproperty
     def tablename(cls) -> str:
@@ -156,16 +199,40 @@ class Model(BaseModel, metaclass=ModelMeta):
             return cls._generate_sqlalchemy_table(cls.database._metadata)
         return cls.__meta__.table
 
-    async def insert(self, exclude_related: bool = False) -> Self:
-        """insert model into database and update primary key"""
+    async def insert(
+        self,
+        exclude_related: bool = False,
+        returning: bool = False,
+    ) -> Self:
+        """insert model into database and update primary key,
+        if returning, refresh all columns such as server defaults from database"""
         async with self.database as conn:
-            result = await conn.execute(
-                self.table.insert().values(
-                    **self._extract_db_fields(exclude_related=exclude_related),
-                ),
-            )
-            if result.inserted_primary_key:
-                self.update_from_dict(result.inserted_primary_key._asdict())
+            values = self._extract_db_fields(exclude_related=exclude_related)
+            if returning:
+                # let the database fill in the server defaults to return,
+                # without returning None is stored as NULL like before
+                values = {
+                    k: v
+                    for k, v in values.items()
+                    if v is not None
+                    or k not in self.table.c
+                    or self.table.c[k].server_default is None
+                }
+            stat = self.table.insert().values(**values)
+            if returning and conn.dialect.insert_returning:
+                stat = stat.returning(*self.table.columns)
+            result = await conn.execute(stat)
+            if returning and conn.dialect.insert_returning:
+                if result_one := result.fetchone():
+                    self._update_from_row(result_one)
+            elif result.inserted_primary_key:
+                self._update_from_row(result.inserted_primary_key)
+                if returning:
+                    result = await conn.execute(
+                        self.table.select().where(self.get_pk_filter()),
+                    )
+                    if result_one := result.fetchone():
+                        self._update_from_row(result_one)
             if not exclude_related:
                 for name, rfield in self.__meta__.reverse_related_fields.items():
                     if related_values := getattr(self, name, None):
@@ -276,17 +343,50 @@ class Model(BaseModel, metaclass=ModelMeta):
 
         return self
 
-    async def update(self, **kwargs: Any) -> Self:
-        """update model with given data"""
+    async def update(
+        self,
+        values: Optional[AnyMapping] = None,
+        /,
+        *,
+        returning: bool = False,
+        **kwargs: Any,
+    ) -> Self:
+        """update model with given data, given as a dict and/or keyword arguments,
+        sql expressions such as `User.money + 10` are evaluated by the database,
+        if returning, refresh all columns such as trigger values from database"""
+        data = merge_update_values(
+            self.__class__,
+            values,
+            kwargs,
+            ["returning"] if returning else [],
+        )
         async with self.database as conn:
             if self._check_pk_null():
                 raise PrimaryKeyMissingError("Primary key can not be null when update")
-            self.update_from_dict(kwargs)
-            await conn.execute(
+            literals, expressions = split_column_expressions(data)
+            if miss := expressions.keys() - self.table.c.keys():
+                raise ValueError(f"{self.__class__.__name__} has no columns: {miss}")
+            self.update_from_dict(literals)
+            stat = (
                 self.table.update()
                 .where(self.get_pk_filter())
-                .values(**self._extract_db_fields(exclude_pk=True)),
+                .values({**self._extract_db_fields(exclude_pk=True), **expressions})
             )
+            refresh_columns = (
+                list(self.table.columns)
+                if returning
+                else [self.table.c[k] for k in expressions]
+            )
+            if refresh_columns and conn.dialect.update_returning:
+                stat = stat.returning(*refresh_columns)
+            result = await conn.execute(stat)
+            if refresh_columns:
+                if not conn.dialect.update_returning:
+                    result = await conn.execute(
+                        select(*refresh_columns).where(self.get_pk_filter()),
+                    )
+                if result_one := result.fetchone():
+                    self._update_from_row(result_one)
         return self
 
     async def fetch(self, related: bool = False) -> Self:
@@ -298,11 +398,24 @@ class Model(BaseModel, metaclass=ModelMeta):
                 self.table.select().where(self.get_pk_filter()),
             )
             if result_one := result.fetchone():
-                self.update_from_dict(result_one._asdict())
+                self._update_from_row(result_one)
             if related:
                 await self.fetch_related()
         return self
 
+    async def load(self, relation: Any) -> Any:
+        """load a relation which was not fetched with the model and return it,
+        for all models of the same query result at once if it was queried
+        with `lazy_related()`"""
+        name = get_relation_name(self.__class__, relation)
+        siblings = self._cherry_siblings_
+        if siblings is None:
+            await QuerySet(self.__class__)._load_relation([self], name)
+        elif name not in siblings.loaded:
+            await QuerySet(self.__class__)._load_relation(siblings.models, name)
+            siblings.loaded.add(name)
+        return getattr(self, name)
+
     async def fetch_related(self, *args: Any) -> Self:
         """fetch related data from database by related field"""
         self_dict = self._extract_db_fields(exclude_related=True)
@@ -333,7 +446,11 @@ class Model(BaseModel, metaclass=ModelMeta):
                     setattr(
                         self,
                         name,
-                        rfield.related_model.parse_from_db_dict(related_one._asdict()),
+                        rfield.related_model.parse_from_db_dict(
+                            rfield.related_model.__meta__.row_mapper.map_row(
+                                related_one,
+                            ),
+                        ),
                     )
                 else:
                     if rfield.nullable:
@@ -370,6 +487,7 @@ class Model(BaseModel, metaclass=ModelMeta):
                         == foreign_key_value,
                     ),
                 )
+                map_row = rfield.related_model.__meta__.row_mapper.map_row
                 if rfield.is_list:
                     setattr(
                         self,
@@ -378,7 +496,7 @@ class Model(BaseModel, metaclass=ModelMeta):
                             rfield.related_model.parse_from_db_dict(
                                 (
                                     {
-                                        **related_one._asdict(),
+                                        **map_row(related_one),
                                         rfield.related_field_name: self_dict,
                                     }
                                 ),
@@ -394,7 +512,7 @@ class Model(BaseModel, metaclass=ModelMeta):
                             rfield.related_model.parse_from_db_dict(
                                 (
                                     {
-                                        **related_one._asdict(),
+                                        **map_row(related_one),
                                         rfield.related_field_name: self_dict,
                                     }
                                 ),
@@ -431,7 +549,11 @@ class Model(BaseModel, metaclass=ModelMeta):
                     self,
                     name,
                     [
-                        field.related_model.parse_from_db_dict(related_one._asdict())
+                        field.related_model.parse_from_db_dict(
+                            field.related_model.__meta__.row_mapper.map_row(
+                                related_one,
+                            ),
+                        )
                         for related_one in related_data.fetchall()
                     ],
                 )
@@ -487,16 +609,103 @@ class Model(BaseModel, metaclass=ModelMeta):
         raise ModelMissingError("You must give at least one model to save")
 
     @classmethod
-    async def delete_many(cls, *models: Self) -> int:
-        """delete many models from database"""
-        if models:
-            async with cls.database as conn:
+    async def update_many(
+        cls,
+        *models: Self,
+        fields: Optional[Sequence[Any]] = None,
+        batch_size: Optional[int] = None,
+    ) -> int:
+        """update many models into database by primary key,
+        each batch is sent as one `UPDATE ... SET column = CASE ... END` statement,
+        only the given fields are updated, default all non primary key fields
+
+        batches are sized to stay within `MAX_BIND_PARAMS` bind parameters,
+        batch_size bounds them further"""
+        if not models:
+            raise ModelMissingError("You must give at least one model to update")
+        column_names = cls._get_column_names(*fields) if fields else None
+        primary_key = cls.__meta__.primary_key
+        if column_names is not None and (pks := set(column_names) & set(primary_key)):
+            raise FieldTypeError(
+                f"{cls.__name__} can not update primary key {pks} by update_many",
+            )
+        if any(model._check_pk_null() for model in models):
+            raise PrimaryKeyMissingError("Primary key can not be null when update")
+        # each row binds its primary key for the IN filter, and its primary key
+        # and value for the CASE of every column
+        column_count = (
+            len(column_names)
+            if column_names is not None
+            else len(cls.table.c) - len(primary_key)
+        )
+        row_params = column_count * (len(primary_key) + 1) + len(primary_key)
+        size = max(1, MAX_BIND_PARAMS // row_params)
+        if batch_size is not None:
+            size = min(size, batch_size)
+        pk_column = cls.table.c[primary_key[0]] if len(primary_key) == 1 else None
+        rowcount = 0
+        async with cls.database as conn:
+            for batch in chunked(models, size):
+                datas = [model._extract_db_fields(exclude_pk=True) for model in batch]
+                names = (
+                    column_names
+                    if column_names is not None
+                    else list(dict.fromkeys(k for data in datas for k in data))
+                )
+                values = {}
+                for name in names:
+                    column = cls.table.c[name]
+                    # a partial model leaves its unselected columns as they are
+                    pairs = [
+                        (model, literal(data[name], column.type))
+                        for model, data in zip(batch, datas)
+                        if name in data
+                    ]
+                    if not pairs:
+                        continue
+                    if pk_column is not None:
+                        # `CASE id WHEN ... THEN ...` compares the key once per row
+                        values[name] = case(
+                            *(
+                                (getattr(model, primary_key[0]), value)
+                                for model, value in pairs
+                            ),
+                            value=pk_column,
+                            else_=column,
+                        )
+                    else:
+                        values[name] = case(
+                            *((model.get_pk_filter(), value) for model, value in pairs),
+                            else_=column,
+                        )
+                if not values:
+                    continue
+                pk_values = [model._get_pk_values() for model in batch]
                 result = await conn.execute(
-                    cls.table.delete(),
-                    [model.model_dump(by_alias=True) for model in models],
+                    cls.table.update()
+                    .where(cls.get_pk_in_filter(pk_values))
+                    .values(values),
                 )
-                return result.rowcount
-        raise ModelMissingError("You must give at least one model to delete")
+                rowcount += result.rowcount
+        return rowcount
+
+    @classmethod
+    async def delete_many(cls, *models: Self, batch_size: int = 500) -> int:
+        """delete many models from database by primary key,
+        each batch is deleted with one `WHERE primary key IN (...)` statement"""
+        if not models:
+            raise ModelMissingError("You must give at least one model to delete")
+        if any(model._check_pk_null() for model in models):
+            raise PrimaryKeyMissingError("Primary key can not be null when delete")
+        rowcount = 0
+        async with cls.database as conn:
+            for batch in chunked(models, batch_size):
+                pk_values = [model._get_pk_values() for model in batch]
+                result = await conn.execute(
+                    cls.table.delete().where(cls.get_pk_in_filter(pk_values)),
+                )
+                rowcount += result.rowcount
+        return rowcount
 
     @classmethod
     def select(cls) -> QuerySet[Self]:
@@ -513,11 +722,25 @@ class Model(BaseModel, metaclass=ModelMeta):
         """select and select related model at the same time"""
         return QuerySet(cls).prefetch_related(*args)
 
+    @classmethod
+    def only(cls, *fields: Any) -> QuerySet[Self]:
+        """select only the given fields, the other fields are left unset"""
+        return QuerySet(cls).only(*fields)
+
     @classmethod
     async def paginate(cls, page: int, page_size: int) -> list[Self]:
         """select with pagination"""
         return await QuerySet(cls).paginate(page, page_size)
 
+    @classmethod
+    async def paginate_with_total(
+        cls,
+        page: int,
+        page_size: int,
+    ) -> tuple[list[Self], int]:
+        """select with pagination and the total count of models"""
+        return await QuerySet(cls).paginate_with_total(page, page_size)
+
     @classmethod
     async def first(cls) -> Optional[Self]:
         """select first model"""
@@ -533,6 +756,11 @@ class Model(BaseModel, metaclass=ModelMeta):
         """select one model randomly"""
         return await QuerySet(cls).random_one()
 
+    @classmethod
+    async def sample(cls, n: int) -> list[Self]:
+        """select n models randomly"""
+        return await QuerySet(cls).sample(n)
+
     @classmethod
     async def get(cls, *args: Any, **kwargs: Any) -> Self:
         """select one model with filter condition, if not exist, raise error"""
@@ -554,22 +782,25 @@ class Model(BaseModel, metaclass=ModelMeta):
         fetch_related: Union[bool, tuple[Any, ...]] = False,
         **kwargs: Any,
     ) -> tuple[Self, bool]:
-        """select one model with filter condition, if not exist, create one"""
+        """select one model with filter condition, if not exist, create one,
+        atomic in one `INSERT ... ON CONFLICT` statement when the filter is an
+        equality on a unique key (see `_upsert`)"""
         queryset = cls.filter(*args, **kwargs)
-        if fetch_related is True or isinstance(fetch_related, tuple):
-            queryset = queryset.prefetch_related(
-                () if fetch_related is True else fetch_related,
-            )
+        related_args = cls._get_fetch_related_args(fetch_related)
+        if related_args is not None:
+            queryset = queryset.prefetch_related(*related_args)
+        create_values = cls._get_create_values(queryset, defaults)
+        # without valid create values the model can only be selected
+        if (conflict_target := cls._get_conflict_target(queryset)) is not None and (
+            model := cls._try_create(create_values)
+        ) is not None:
+            data, inserted = await model._upsert(conflict_target, [])
+            if inserted:
+                return model, False
+            return await cls._parse_upserted(data, related_args), True
         try:
             return await queryset.get(), True
         except NoMatchDataError:
-            create_values = queryset._clause_list_to_dict()
-            create_values.update(
-                {
-                    (k.name if isinstance(k, Column) else k): v
-                    for k, v in (defaults or {}).items()
-                },
-            )
             return await cls(**create_values).insert(), False
 
     @classmethod
@@ -581,23 +812,47 @@ class Model(BaseModel, metaclass=ModelMeta):
         **kwargs: Any,
     ) -> tuple[Self, bool]:
         """update one model with filter condition,
-        if not exist, create one with filter and defaults values"""
+        if not exist, create one with filter and defaults values,
+        atomic in one `INSERT ... ON CONFLICT DO UPDATE` statement when the filter
+        is an equality on a unique key (see `_upsert`)"""
         queryset = cls.filter(*args, **kwargs)
-        if fetch_related is True or isinstance(fetch_related, tuple):
-            queryset = queryset.prefetch_related(
-                () if fetch_related is True else fetch_related,
-            )
+        related_args = cls._get_fetch_related_args(fetch_related)
+        if related_args is not None:
+            queryset = queryset.prefetch_related(*related_args)
+        create_values = cls._get_create_values(queryset, defaults)
+        if (conflict_target := cls._get_conflict_target(queryset)) is not None:
+            if (model := cls._try_create(create_values)) is not None:
+                data, inserted = await model._upsert(
+                    conflict_target,
+                    cls._get_column_names(*defaults) if defaults else [],
+                )
+                if inserted:
+                    return model, False
+                return await cls._parse_upserted(data, related_args), True
+            if defaults:
+                # the values are not enough to create one, so it can only be
+                # updated, which is atomic in one `UPDATE ... RETURNING`
+                values = validate_fields(
+                    cls,
+                    merge_update_values(cls, defaults, {}, []),
+                )
+                async with cls.database as conn:
+                    result = await conn.execute(
+                        cls.table.update()
+                        .where(queryset.options.get_where_clause())
+                        .values(values)
+                        .returning(*cls.table.columns),
+                    )
+                    if (result_one := result.fetchone()) is None:
+                        # raises why the model can not be created
+                        cls(**create_values)
+                data = cls.__meta__.row_mapper.get(result_one._fields)(result_one)
+                return await cls._parse_upserted(data, related_args), True
+        # without a unique key to conflict on this is not atomic
         try:
             model = await queryset.get()
             return await model.update(**(defaults or {})), True
         except NoMatchDataError:
-            create_values = queryset._clause_list_to_dict()
-            create_values.update(
-                {
-                    (k.name if isinstance(k, Column) else k): v
-                    for k, v in (defaults or {}).items()
-                },
-            )
             return await cls(**create_values).insert(), False
 
     async def add(self, model: "Model") -> Self:
@@ -644,25 +899,157 @@ class Model(BaseModel, metaclass=ModelMeta):
 
     async def remove(self, model: "Model"):
         _, field = self._get_field_type_by_model(model)
+        if isinstance(field, ManyToManyField):
+            await self.remove_many(model)
+        elif isinstance(field, ReverseRelationshipField) and field.is_list:
+            await model.delete()
+            getattr(self, field.related_field_name).remove(model)
+        else:
+            raise RelationSolveError(
+                (
+                    f"There are no related fields associated with {type(model)} to"
+                    " remove"
+                ),
+            )
+
+    async def add_many(self, *models: "Model") -> Self:
+        """link models of a many to many relation with one batched insert,
+        skipping the links which already exist"""
+        if not models:
+            return self
+        name, field = self._get_many_to_many_field(models[0])
+        related_models = self._get_m2m_related_models(field, models)
         async with self.database as conn:
-            if isinstance(field, ManyToManyField):
-                await conn.execute(
-                    field.table.delete().where(
-                        field.table.c[field.m2m_table_field_name]
-                        == getattr(self, field.m2m_field_name),
-                    ),
-                )
-                getattr(self, field.related_field.related_field_name).remove(model)
-            elif isinstance(field, ReverseRelationshipField) and field.is_list:
-                await model.delete()
-                getattr(self, field.related_field_name).remove(model)
-            else:
+            linked = await self._get_m2m_linked_values(conn, field, related_models)
+            await self._insert_m2m_links(
+                conn,
+                field,
+                [value for value in related_models if value not in linked],
+            )
+        value = getattr(self, name)
+        if not isinstance(value, list):
+            value = []
+            setattr(self, name, value)
+        key = field.related_field.m2m_field_name
+        known = {getattr(model, key) for model in value}
+        value.extend(model for v, model in related_models.items() if v not in known)
+        return self
+
+    async def remove_many(self, *models: "Model") -> Self:
+        """unlink models of a many to many relation with one delete"""
+        if not models:
+            return self
+        name, field = self._get_many_to_many_field(models[0])
+        related_models = self._get_m2m_related_models(field, models)
+        async with self.database as conn:
+            await self._delete_m2m_links(conn, field, list(related_models))
+        value = getattr(self, name)
+        if isinstance(value, list):
+            key = field.related_field.m2m_field_name
+            value[:] = [
+                model for model in value if getattr(model, key) not in related_models
+            ]
+        return self
+
+    async def set_related(self, relation: Any, models: Sequence["Model"]) -> Self:
+        """make models the only ones linked by a many to many relation,
+        inserting and deleting just the links which differ"""
+        name = get_relation_name(self.__class__, relation)
+        field = self.__meta__.many_to_many_fields.get(name)
+        if field is None:
+            raise RelationSolveError(f"{name} is not a many to many relation")
+        related_models = self._get_m2m_related_models(field, models)
+        async with self.database as conn:
+            linked = await self._get_m2m_linked_values(conn, field)
+            await self._delete_m2m_links(
+                conn,
+                field,
+                [value for value in linked if value not in related_models],
+            )
+            await self._insert_m2m_links(
+                conn,
+                field,
+                [value for value in related_models if value not in linked],
+            )
+        setattr(self, name, list(related_models.values()))
+        return self
+
+    def _get_many_to_many_field(self, model: "Model") -> tuple[str, ManyToManyField]:
+        name, field = self._get_field_type_by_model(model)
+        if not isinstance(field, ManyToManyField):
+            raise RelationSolveError(
+                f"{type(model)} is not related to {type(self)} by many to many",
+            )
+        return name, field
+
+    def _get_m2m_related_models(
+        self,
+        field: ManyToManyField,
+        models: Sequence["Model"],
+    ) -> dict[Any, "Model"]:
+        if getattr(self, field.m2m_field_name, None) is None:
+            raise RelatedFieldMissingError(
+                "Can not link related models if not been inserted into database",
+            )
+        related_models = {}
+        for model in models:
+            if not isinstance(model, field.related_model):
                 raise RelationSolveError(
-                    (
-                        f"There are no related fields associated with {type(model)} to"
-                        " remove"
-                    ),
+                    f"{type(model)} is not the model of {type(self)}'s relation",
                 )
+            related_models[getattr(model, field.related_field.m2m_field_name)] = model
+        return related_models
+
+    async def _get_m2m_linked_values(
+        self,
+        conn: AsyncConnection,
+        field: ManyToManyField,
+        values: Optional[Iterable[Any]] = None,
+    ) -> set[Any]:
+        related_column = field.table.c[field.related_field.m2m_table_field_name]
+        stat = select(related_column).where(
+            field.table.c[field.m2m_table_field_name]
+            == getattr(self, field.m2m_field_name),
+        )
+        if values is not None:
+            stat = stat.where(related_column.in_(list(values)))
+        return set((await conn.execute(stat)).scalars())
+
+    async def _insert_m2m_links(
+        self,
+        conn: AsyncConnection,
+        field: ManyToManyField,
+        values: list[Any],
+    ):
+        if not values:
+            return
+        self_value = getattr(self, field.m2m_field_name)
+        await conn.execute(
+            field.table.insert(),
+            [
+                {
+                    field.m2m_table_field_name: self_value,
+                    field.related_field.m2m_table_field_name: value,
+                }
+                for value in values
+            ],
+        )
+
+    async def _delete_m2m_links(
+        self,
+        conn: AsyncConnection,
+        field: ManyToManyField,
+        values: list[Any],
+    ):
+        if not values:
+            return
+        await conn.execute(
+            field.table.delete().where(
+                field.table.c[field.m2m_table_field_name]
+                == getattr(self, field.m2m_field_name),
+                field.table.c[field.related_field.m2m_table_field_name].in_(values),
+            ),
+        )
 
     def get_pk_filter(self) -> ColumnElement[bool]:
         """generate primary key filter condition"""
@@ -679,6 +1066,18 @@ class Model(BaseModel, metaclass=ModelMeta):
         """get primary key columns"""
         return tuple(getattr(cls, pk) for pk in cls.__meta__.primary_key)
 
+    @classmethod
+    def get_pk_in_filter(
+        cls,
+        pk_values: Sequence[Sequence[Any]],
+    ) -> ColumnElement[bool]:
+        """generate primary key IN filter condition,
+        each value holds the primary key values in `__meta__.primary_key` order"""
+        pk_columns = cls.get_pk_columns()
+        if len(pk_columns) == 1:
+            return pk_columns[0].in_([value[0] for value in pk_values])
+        return tuple_(*pk_columns).in_([tuple(value) for value in pk_values])
+
     @classmethod
     def parse_from_db_dict(cls, data: DictStrAny) -> Self:
         """parse model from database result dict"""
@@ -690,6 +1089,73 @@ class Model(BaseModel, metaclass=ModelMeta):
             )
         return model
 
+    @classmethod
+    def parse_partial_from_db_dict(cls, data: DictStrAny) -> Self:
+        """parse model from database result dict which only holds some columns,
+        only the given fields are validated and the missing ones are left unset"""
+        foreign_key_values = {
+            foreign_key: data.pop(foreign_key)
+            for foreign_key in cls.__meta__.foreign_keys
+            if foreign_key in data
+        }
+        validated = get_fields_validator(cls, frozenset(data)).model_validate(data)
+        model = cls.model_construct(
+            _fields_set=set(data),
+            **{k: getattr(validated, k) for k in data},
+        )
+        # `model_construct` fills in the defaults of the unselected columns,
+        # drop them so they can not be mistaken for database values
+        for name in cls._get_value_column_names() - data.keys():
+            model.__dict__.pop(name, None)
+        model._cherry_partial_ = True
+        model._cherry_foreign_key_values_.update(foreign_key_values)
+        return model
+
+    @classmethod
+    def parse_many_from_db_dict(cls, datas: list[DictStrAny]) -> list[Self]:
+        """parse models from database result dicts in one validation call"""
+        models: list[Self] = get_list_adapter(cls).validate_python(datas)
+        cls._set_foreign_key_values(models, datas)
+        return models
+
+    @classmethod
+    def parse_partial_many_from_db_dict(cls, datas: list[DictStrAny]) -> list[Self]:
+        """parse models from database result dicts which only hold some columns,
+        all dicts must hold the same columns"""
+        if not datas:
+            return []
+        names = [name for name in datas[0] if name not in cls.__meta__.foreign_keys]
+        validator = get_fields_validator(cls, frozenset(names))
+        validated = get_list_adapter(validator).validate_python(datas)
+        fields_set = set(names)
+        unselected = cls._get_value_column_names() - fields_set
+        models = [
+            cls.model_construct(fields_set, **{k: getattr(one, k) for k in names})
+            for one in validated
+        ]
+        for model in models:
+            for name in unselected:
+                model.__dict__.pop(name, None)
+            model._cherry_partial_ = True
+        cls._set_foreign_key_values(models, datas)
+        return models
+
+    @classmethod
+    def _set_foreign_key_values(cls, models: list[Self], datas: list[DictStrAny]):
+        foreign_keys = [
+            foreign_key
+            for foreign_key in cls.__meta__.foreign_keys
+            if datas and foreign_key in datas[0]
+        ]
+        if not foreign_keys:
+            return
+        # gather each foreign key column once, then attach the values row by row
+        columns = [
+            [data[foreign_key] for data in datas] for foreign_key in foreign_keys
+        ]
+        for model, values in zip(models, zip(*columns)):
+            model._cherry_foreign_key_values_.update(zip(foreign_keys, values))
+
     def update_from_dict(self, update_data: AnyMapping):
         """update model from dict"""
         for k, v in update_data.items():
@@ -698,6 +1164,10 @@ class Model(BaseModel, metaclass=ModelMeta):
             elif k in self.__meta__.foreign_keys:
                 self._cherry_foreign_key_values_[k] = v
 
+    def _update_from_row(self, row: Row):
+        """update model from a result row, mapped by the row mapper of the model"""
+        self.update_from_dict(self.__meta__.row_mapper.get(row._fields)(row))
+
     def update_from_kwargs(self, **kwargs: Any):
         """update model from kwargs"""
         for k, v in kwargs.items():
@@ -711,7 +1181,8 @@ class Model(BaseModel, metaclass=ModelMeta):
         exclude_pk: bool = False,
         exclude_related: bool = False,
     ) -> DictStrAny:
-        """extract database fields from model"""
+        """extract database fields from model,
+        a partial model only gives the fields which have been set"""
         exclude = (
             self.__meta__.related_fields.keys()
             | self.__meta__.reverse_related_fields.keys()
@@ -719,11 +1190,16 @@ class Model(BaseModel, metaclass=ModelMeta):
         )
         if exclude_pk:
             exclude |= set(self.__meta__.primary_key)
+        partial = self._is_partial()
+        if partial:
+            exclude |= self.model_fields.keys() - self.model_fields_set
         data = self.model_dump(by_alias=True, exclude=exclude)
         data = {k: list(v) if isinstance(v, set) else v for k, v in data.items()}
         if exclude_related:
             return data
         for field_name, field in self.__meta__.related_fields.items():
+            if partial and field_name not in self.model_fields_set:
+                continue
             self_value = getattr(self, field_name)
             if self_value is None:
                 data[field.foreign_key_self_name] = None
@@ -745,6 +1221,168 @@ class Model(BaseModel, metaclass=ModelMeta):
                 )
         return data
 
+    @classmethod
+    def _get_column_names(cls, *fields: Any) -> list[str]:
+        """get database column names of the given fields,
+        fields can be field names, Column or related field"""
+        column_names = []
+        for field in fields:
+            if isinstance(field, Column):
+                column_names.append(field.name)
+            elif isinstance(field, RelatedModelProxy):
+                column_names.append(field.get_column().name)
+            elif isinstance(field, str) and field in cls.__meta__.columns:
+                column_names.append(cls.__meta__.columns[field].name)
+            else:
+                raise FieldTypeError(
+                    f"{cls.__name__} has no database column for field {field}",
+                )
+        return column_names
+
+    async def _upsert(
+        self,
+        conflict_target: Sequence[str],
+        update_names: Sequence[str],
+    ) -> tuple[DictStrAny, bool]:
+        """insert model unless its unique key conflicts, else update update_names
+        of the conflicting row from the model, return the stored row and whether
+        the model has been inserted (then it is refreshed from the row)
+
+        on postgresql this is one `INSERT ... ON CONFLICT DO UPDATE ... RETURNING`
+        which tells an inserted row by `xmax = 0`, sqlite can not tell them apart
+        in RETURNING, so a conflict is read or updated by a second statement in
+        the write transaction the insert has already locked
+        """
+        dialect = self.database.engine.dialect
+        insert = get_upsert_insert(dialect)
+        if insert is None:
+            raise DialectNotSupportedError(
+                f"{dialect.name} does not support INSERT ... ON CONFLICT",
+            )
+        data = self._extract_db_fields()
+        stat = insert(self.table).values(**data)
+        async with self.database as conn:
+            if dialect.name == "postgresql":
+                names = update_names or conflict_target
+                result = await conn.execute(
+                    stat.on_conflict_do_update(
+                        index_elements=conflict_target,
+                        # a conflict without update sets the key to itself,
+                        # so the existing row is returned
+                        set_={name: stat.excluded[name] for name in names},
+                    ).returning(
+                        *self.table.columns,
+                        literal_column("xmax = 0", Boolean).label(_INSERTED),
+                    ),
+                )
+                result_one = result.one()
+                row = self.__meta__.row_mapper.get(result_one._fields)(result_one)
+                inserted = row.pop(_INSERTED)
+            else:
+                result = await conn.execute(
+                    stat.on_conflict_do_nothing(
+                        index_elements=conflict_target,
+                    ).returning(*self.table.columns),
+                )
+                inserted = (result_one := result.fetchone()) is not None
+                if not inserted:
+                    where = reduce(
+                        and_,
+                        (self.table.c[name] == data[name] for name in conflict_target),
+                    )
+                    stat = (
+                        self.table.update()
+                        .where(where)
+                        .values({name: data[name] for name in update_names})
+                        if update_names
+                        else self.table.select().where(where)
+                    )
+                    if update_names:
+                        stat = stat.returning(*self.table.columns)
+                    result_one = (await conn.execute(stat)).one()
+                row = self.__meta__.row_mapper.get(result_one._fields)(result_one)
+        if inserted:
+            self.update_from_dict(row)
+        return row, inserted
+
+    @classmethod
+    def _try_create(cls, create_values: DictStrAny) -> Optional[Self]:
+        try:
+            return cls(**create_values)
+        except ValidationError:
+            return None
+
+    @classmethod
+    async def _parse_upserted(
+        cls,
+        data: DictStrAny,
+        related_args: Optional[tuple[Any, ...]],
+    ) -> Self:
+        model = cls.parse_from_db_dict(data)
+        if related_args is not None:
+            await model.fetch_related(*related_args)
+        return model
+
+    @staticmethod
+    def _get_fetch_related_args(
+        fetch_related: Union[bool, tuple[Any, ...]],
+    ) -> Optional[tuple[Any, ...]]:
+        if fetch_related is True:
+            return ()
+        if isinstance(fetch_related, tuple):
+            return fetch_related
+        return None
+
+    @classmethod
+    def _get_create_values(
+        cls,
+        queryset: QuerySet[Self],
+        defaults: Optional[DictStrAny],
+    ) -> DictStrAny:
+        create_values = queryset._clause_list_to_dict()
+        create_values.update(
+            {
+                (k.name if isinstance(k, Column) else k): v
+                for k, v in (defaults or {}).items()
+            },
+        )
+        return create_values
+
+    @classmethod
+    def _get_conflict_target(cls, queryset: QuerySet[Self]) -> Optional[list[str]]:
+        """get the unique key columns which exactly match the equality filter,
+        None if there is no such key or the dialect can not upsert"""
+        if get_upsert_insert(cls.database.engine.dialect) is None:
+            return None
+        if not (columns := queryset._get_equal_columns()):
+            return None
+        unique_keys = [
+            constraint.columns
+            for constraint in cls.table.constraints
+            if isinstance(constraint, (PrimaryKeyConstraint, UniqueConstraint))
+        ]
+        unique_keys.extend(index.columns for index in cls.table.indexes if index.unique)
+        for key in unique_keys:
+            if {column.name for column in key} == columns:
+                return [column.name for column in key]
+        return None
+
+    def _get_pk_values(self) -> tuple[Any, ...]:
+        """get primary key values in `__meta__.primary_key` order"""
+        return tuple(getattr(self, pk) for pk in self.__meta__.primary_key)
+
+    def _is_partial(self) -> bool:
+        """whether some columns were not selected when the model was queried,
+        e.g. with `only`"""
+        return self._cherry_partial_
+
+    @classmethod
+    def _get_value_column_names(cls) -> set[str]:
+        """names of the column fields holding plain values, foreign key relations
+        keep their default when not selected so they never fall through to the
+        class level proxy"""
+        return cls.__meta__.columns.keys() - cls.__meta__.related_fields.keys()
+
     def _check_pk_null(self) -> bool:
         """check if primary key is null"""
         return all(getattr(self, pk) is None for pk in self.__meta__.primary_key)
@@ -827,6 +1465,9 @@ class Model(BaseModel, metaclass=ModelMeta):
 
     @classmethod
     def _resolve_sqlalchemy_column(cls):
+        if hasattr(cls.__meta__, "table"):
+            # columns are already bound to the generated table
+            return cls.__meta__.columns
         for field_name, field_info in cls.model_fields.items():
             if isinstance(field_info, BaseField):
                 nullable, type_, is_json = get_sqlalchemy_type_from_field(
@@ -933,7 +1574,8 @@ class Model(BaseModel, metaclass=ModelMeta):
                         **field_info.foreign_key_extra,
                     ),
                     nullable=field_info.nullable,
-                    **field_info.sa_column_extra,
+                    # reverse relation lookups and EXISTS filters go through it
+                    **{"index": True, **field_info.sa_column_extra},
                 )
                 cls.__meta__.related_fields[field_name] = field_info
                 setattr(
@@ -1075,6 +1717,7 @@ class Model(BaseModel, metaclass=ModelMeta):
             *cls.__meta__.columns.values(),
             *cls.__meta__.constraints,
         )
+        cls.__meta__.row_mapper = RowMapper(cls.__meta__.table)
         # many to many table
         for field_name, field in cls.__meta__.many_to_many_fields.items():
             if (
@@ -1104,6 +1747,7 @@ class Model(BaseModel, metaclass=ModelMeta):
                             or (field.related_field and field.related_field.on_update)
                             or "NO ACTION",
                         ),
+                        index=True,
                     ),
                     Column(
                         field.related_field.m2m_table_field_name,
@@ -1119,6 +1763,7 @@ class Model(BaseModel, metaclass=ModelMeta):
                             or (field.related_field and field.related_field.on_update)
                             or "NO ACTION",
                         ),
+                        index=True,
                     ),
                 )
                 field.table = table
@@ -1 +1,8 @@
+from .count import CountResult as CountResult
+from .explain import (
+    PlanNode as PlanNode,
+    QueryPlan as QueryPlan,
+)
+from .prefetch import Prefetch as Prefetch
 from .queryset import QuerySet as QuerySet
+from .record import Record as Record
@@ -0,0 +1,60 @@
+from array import array
+from importlib.util import find_spec
+from typing import Any, Optional, Union
+
+from sqlalchemy import Float, Integer, Select
+from sqlalchemy.ext.asyncio import AsyncConnection
+from sqlalchemy.types import TypeEngine
+
+Column = Union["array[Any]", list[Any]]
+
+# rows fetched from the cursor at a time while filling the columns
+PARTITION_SIZE = 1000
+
+
+def get_typecode(type_: TypeEngine) -> Optional[str]:
+    """array typecode of a column type, None if it is not numeric"""
+    if isinstance(type_, Float):
+        return "d"
+    if isinstance(type_, Integer):
+        return "q"
+    return None
+
+
+def _to_numpy(column: Column) -> Any:
+    import numpy
+
+    if isinstance(column, array):
+        # shares the buffer of the array instead of copying it
+        return numpy.frombuffer(column, dtype=column.typecode)
+    return numpy.array(column, dtype=object)
+
+
+async def fetch_columns(
+    conn: AsyncConnection,
+    select_stat: Select,
+    numpy: bool = False,
+) -> dict[str, Any]:
+    """fetch select_stat column by column, numeric columns are filled into
+    `array.array` (or numpy arrays) and the others into lists,
+    a numeric column falls back to a list when it contains NULL"""
+    if numpy and find_spec("numpy") is None:
+        raise ImportError("numpy is required for columns(numpy=True)")
+    selected = list(select_stat.selected_columns)
+    columns: list[Column] = []
+    for column in selected:
+        typecode = get_typecode(column.type)
+        columns.append([] if typecode is None else array(typecode))
+    result = await conn.stream(select_stat)
+    async for partition in result.partitions(PARTITION_SIZE):
+        for i, column in enumerate(columns):
+            values = [row[i] for row in partition]
+            if isinstance(column, array) and None in values:
+                column = columns[i] = column.tolist()
+            column.extend(values)
+    # keyed by the labels of the result, which deduplicates the same names of
+    # different tables (e.g. "name" and "name_1") like `value_dict` does
+    return {
+        key: _to_numpy(values) if numpy else values
+        for key, values in zip(result.keys(), columns)
+    }
@@ -0,0 +1,139 @@
+from dataclasses import dataclass
+from typing import Literal, Optional
+
+from .explain import explain_pg_json
+
+from sqlalchemy import Select, Table, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+CountMethod = Literal["exact", "table_statistics", "plan_estimate"]
+
+
+@dataclass(frozen=True)
+class CountResult:
+    """result of `QuerySet.count(approximate=True)`
+
+    method is "exact" when the rows were counted, "table_statistics" when read
+    from pg_class/sqlite_stat1 and "plan_estimate" when taken from EXPLAIN
+    """
+
+    count: int
+    method: CountMethod
+
+    @property
+    def is_exact(self) -> bool:
+        return self.method == "exact"
+
+    def __int__(self) -> int:
+        return self.count
+
+
+async def get_pg_reltuples(
+    conn: AsyncConnection,
+    table: Table,
+) -> Optional[float]:
+    """estimated rows of table from pg_class, None if it is unknown
+
+    looked up by name instead of `CAST(name AS regclass)`, which folds unquoted
+    names to lower case (e.g. the default table name "User") and fails
+    """
+    reltuples = (
+        await conn.execute(
+            text(
+                "SELECT c.reltuples FROM pg_class c"
+                " JOIN pg_namespace n ON n.oid = c.relnamespace"
+                " WHERE c.relname = :name"
+                " AND n.nspname = COALESCE(:schema, current_schema())",
+            ),
+            {"name": table.name, "schema": table.schema},
+        )
+    ).scalar()
+    # -1 means the table has never been vacuumed or analyzed
+    if reltuples is None or reltuples < 0:
+        return None
+    return reltuples
+
+
+async def _count_from_pg_class(
+    conn: AsyncConnection,
+    table: Table,
+) -> Optional[int]:
+    reltuples = await get_pg_reltuples(conn, table)
+    return None if reltuples is None else int(reltuples)
+
+
+async def _count_from_pg_explain(
+    conn: AsyncConnection,
+    stat: Select,
+) -> Optional[int]:
+    plan = await explain_pg_json(conn, stat)
+    try:
+        return int(plan[0]["Plan"]["Plan Rows"])
+    except (IndexError, KeyError, TypeError):
+        return None
+
+
+async def _count_from_sqlite_stat1(
+    conn: AsyncConnection,
+    table: Table,
+    equal_columns: set[str],
+) -> Optional[int]:
+    has_stat = (
+        await conn.execute(
+            text(
+                "SELECT 1 FROM sqlite_master"
+                " WHERE type = 'table' AND name = 'sqlite_stat1'",
+            ),
+        )
+    ).scalar()
+    if not has_stat:
+        return None
+    stats = (
+        await conn.execute(
+            text("SELECT idx, stat FROM sqlite_stat1 WHERE tbl = :name"),
+            {"name": table.name},
+        )
+    ).fetchall()
+    for index_name, stat in stats:
+        # stat is "rows avg_rows_per_key1 avg_rows_per_key1_key2 ..."
+        numbers = [int(n) for n in stat.split() if n.isdigit()]
+        if not numbers:
+            continue
+        if not equal_columns:
+            return numbers[0]
+        if index_name is None:
+            continue
+        index_columns = [
+            row[2]
+            for row in (
+                await conn.exec_driver_sql(f'PRAGMA index_info("{index_name}")')
+            ).fetchall()
+        ]
+        size = len(equal_columns)
+        if set(index_columns[:size]) == equal_columns and len(numbers) > size:
+            return numbers[size]
+    return None
+
+
+async def approximate_count(
+    conn: AsyncConnection,
+    table: Table,
+    stat: Select,
+    equal_columns: Optional[set[str]],
+) -> Optional[CountResult]:
+    """estimate the rows of stat from planner statistics,
+    equal_columns are the columns filtered by equality (empty without filter)
+    or None if the filter is not a plain equality on the table"""
+    if conn.dialect.name == "postgresql":
+        if (
+            equal_columns == set()
+            and (count := await _count_from_pg_class(conn, table)) is not None
+        ):
+            return CountResult(count, "table_statistics")
+        if (count := await _count_from_pg_explain(conn, stat)) is not None:
+            return CountResult(count, "plan_estimate")
+    elif conn.dialect.name == "sqlite" and equal_columns is not None:
+        count = await _count_from_sqlite_stat1(conn, table, equal_columns)
+        if count is not None:
+            return CountResult(count, "table_statistics")
+    return None
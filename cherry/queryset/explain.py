@@ -0,0 +1,164 @@
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+import json
+import re
+from typing import Any, Optional
+
+from cherry.exception import DialectNotSupportedError
+
+from sqlalchemy import Dialect, Result, Select
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+# e.g. "SEARCH user USING INDEX ix_user_name (name=?)" or "SCAN TABLE user"
+_SQLITE_DETAIL = re.compile(
+    r"^(?P<op>SCAN|SEARCH) (?:TABLE )?(?P<table>\S+)(?: AS \S+)?"
+    r"(?: USING (?:[A-Z ]*?)INDEX (?P<index>\S+)"
+    r"| USING (?P<pk>INTEGER PRIMARY KEY))?",
+)
+
+
+@dataclass
+class PlanNode:
+    """a step of a query plan
+
+    full_scan is True when the step reads every row of table,
+    index is the index (or "PRIMARY KEY" for the rowid) used to find rows
+    """
+
+    detail: str
+    table: Optional[str] = None
+    index: Optional[str] = None
+    full_scan: bool = False
+    estimated_rows: Optional[float] = None
+    actual_rows: Optional[float] = None
+    children: list["PlanNode"] = field(default_factory=list)
+
+    def walk(self) -> Iterator["PlanNode"]:
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+
+@dataclass
+class QueryPlan:
+    """result of `QuerySet.explain()`, raw is what the database returned"""
+
+    dialect: str
+    statement: str
+    nodes: list[PlanNode]
+    raw: Any
+
+    def walk(self) -> Iterator[PlanNode]:
+        for node in self.nodes:
+            yield from node.walk()
+
+    def has_full_scan(self, table: Optional[str] = None) -> bool:
+        return any(
+            node.full_scan and (table is None or node.table == table)
+            for node in self.walk()
+        )
+
+    def uses_index(self, name: Optional[str] = None) -> bool:
+        return any(
+            node.index is not None and (name is None or node.index == name)
+            for node in self.walk()
+        )
+
+    def __str__(self) -> str:
+        lines: list[str] = []
+
+        def add(node: PlanNode, depth: int) -> None:
+            lines.append("  " * depth + node.detail)
+            for child in node.children:
+                add(child, depth + 1)
+
+        for node in self.nodes:
+            add(node, 0)
+        return "\n".join(lines)
+
+
+def compile_explain(prefix: str, stat: Select, dialect: Dialect) -> str:
+    """EXPLAIN statement of a select, such as `EXPLAIN QUERY PLAN SELECT ...`,
+    parameters of stat are rendered by the literal processors of their types
+    (e.g. JSON path, Enum or date), so the statement runs without parameters"""
+    compiled = stat.compile(
+        dialect=dialect,
+        compile_kwargs={"literal_binds": True, "render_postcompile": True},
+    )
+    return f"{prefix} {compiled}"
+
+
+async def _explain(conn: AsyncConnection, prefix: str, stat: Select) -> Result[Any]:
+    # the rows are the plan, not the selected columns of stat,
+    # so they are fetched as driver rows, not through the result processors
+    return await conn.exec_driver_sql(compile_explain(prefix, stat, conn.dialect))
+
+
+async def explain_pg_json(
+    conn: AsyncConnection,
+    stat: Select,
+    analyze: bool = False,
+) -> Any:
+    """run `EXPLAIN (FORMAT JSON)` on stat and return the decoded plan"""
+    prefix = "EXPLAIN (FORMAT JSON, ANALYZE)" if analyze else "EXPLAIN (FORMAT JSON)"
+    raw = (await _explain(conn, prefix, stat)).scalar()
+    if isinstance(raw, str):
+        raw = json.loads(raw)
+    return raw
+
+
+def _parse_sqlite_plan(rows: list[Any]) -> list[PlanNode]:
+    roots: list[PlanNode] = []
+    nodes: dict[int, PlanNode] = {}
+    # rows are (id, parent, notused, detail), parents come before children
+    for id_, parent, _, detail in rows:
+        node = PlanNode(detail)
+        if match := _SQLITE_DETAIL.match(detail):
+            node.table = match["table"]
+            node.index = match["index"] or (match["pk"] and "PRIMARY KEY")
+            node.full_scan = match["op"] == "SCAN"
+        nodes[id_] = node
+        if parent in nodes:
+            nodes[parent].children.append(node)
+        else:
+            roots.append(node)
+    return roots
+
+
+def _parse_pg_plan(plan: dict[str, Any]) -> PlanNode:
+    node_type = plan.get("Node Type", "")
+    detail = node_type
+    if "Relation Name" in plan:
+        detail += f" on {plan['Relation Name']}"
+    if "Index Name" in plan:
+        detail += f" using {plan['Index Name']}"
+    return PlanNode(
+        detail,
+        table=plan.get("Relation Name"),
+        index=plan.get("Index Name"),
+        full_scan=node_type == "Seq Scan",
+        estimated_rows=plan.get("Plan Rows"),
+        actual_rows=plan.get("Actual Rows"),
+        children=[_parse_pg_plan(child) for child in plan.get("Plans", ())],
+    )
+
+
+async def explain_select(
+    conn: AsyncConnection,
+    stat: Select,
+    analyze: bool = False,
+) -> QueryPlan:
+    """run the dialect's EXPLAIN on stat,
+    analyze executes the statement and is only supported by postgresql"""
+    dialect = conn.dialect.name
+    statement = str(stat.compile(dialect=conn.dialect))
+    if dialect == "sqlite":
+        if analyze:
+            raise DialectNotSupportedError("sqlite does not support EXPLAIN ANALYZE")
+        rows = (await _explain(conn, "EXPLAIN QUERY PLAN", stat)).all()
+        raw = [tuple(row) for row in rows]
+        return QueryPlan(dialect, statement, _parse_sqlite_plan(raw), raw)
+    if dialect == "postgresql":
+        raw = await explain_pg_json(conn, stat, analyze)
+        return QueryPlan(dialect, statement, [_parse_pg_plan(raw[0]["Plan"])], raw)
+    raise DialectNotSupportedError(f"explain is not supported on {dialect}")
@@ -0,0 +1,123 @@
+from collections import deque
+from collections.abc import Iterator
+from dataclasses import dataclass
+from functools import reduce
+from typing import Any, Optional, TYPE_CHECKING
+
+from sqlalchemy import Column, ColumnElement, FromClause, Table
+from sqlalchemy.sql.selectable import Exists, ScalarSelect, SelectBase
+
+if TYPE_CHECKING:
+    from cherry.models import Model
+
+
+@dataclass(eq=False)
+class JoinStep:
+    table: Table
+    onclause: Optional[ColumnElement[bool]]
+    # a to-many step may repeat rows of the model being queried
+    many: bool = False
+
+
+def get_clause_tables(clause: Any) -> list[Table]:
+    """get all tables referenced by the clause tree in order,
+    subqueries and EXISTS are correlated on their own and not descended into"""
+    tables: dict[Table, None] = {}
+    stack = [clause]
+    while stack:
+        element = stack.pop()
+        if isinstance(element, (SelectBase, ScalarSelect, Exists)):
+            continue
+        if isinstance(element, Column):
+            if isinstance(element.table, Table):
+                tables[element.table] = None
+            continue
+        stack.extend(reversed(list(element.get_children())))
+    return list(tables)
+
+
+def iter_relation_steps(
+    model_cls: type["Model"],
+) -> Iterator[tuple[type["Model"], list[JoinStep]]]:
+    """yield each related model with the join steps leading to it"""
+    table = model_cls.table
+    for field in model_cls.__meta__.related_fields.values():
+        related_table = field.related_model.table
+        yield (
+            field.related_model,
+            [
+                JoinStep(
+                    related_table,
+                    table.c[field.foreign_key_self_name]
+                    == related_table.c[field.foreign_key],
+                ),
+            ],
+        )
+    for field in model_cls.__meta__.reverse_related_fields.values():
+        related_table = field.related_model.table
+        yield (
+            field.related_model,
+            [
+                JoinStep(
+                    related_table,
+                    related_table.c[field.related_field.foreign_key_self_name]
+                    == table.c[field.related_field.foreign_key],
+                    many=field.is_list,
+                ),
+            ],
+        )
+    for field in model_cls.__meta__.many_to_many_fields.values():
+        related_table = field.related_model.table
+        yield (
+            field.related_model,
+            [
+                JoinStep(
+                    field.table,
+                    field.table.c[field.m2m_table_field_name]
+                    == table.c[field.m2m_field_name],
+                    many=True,
+                ),
+                JoinStep(
+                    related_table,
+                    related_table.c[field.related_field.m2m_field_name]
+                    == field.table.c[field.related_field.m2m_table_field_name],
+                    many=True,
+                ),
+            ],
+        )
+
+
+def plan_joins(model_cls: type["Model"], clause: Any) -> list[JoinStep]:
+    """plan the deduplicated joins needed to filter model_cls by clause,
+    following the shortest relation path to every referenced table"""
+    if clause is None:
+        return []
+    targets = [t for t in get_clause_tables(clause) if t is not model_cls.table]
+    if not targets:
+        return []
+    paths: dict[Table, list[JoinStep]] = {model_cls.table: []}
+    visited = {model_cls}
+    queue = deque([model_cls])
+    while queue and any(target not in paths for target in targets):
+        current = queue.popleft()
+        for related_model, steps in iter_relation_steps(current):
+            for i, step in enumerate(steps):
+                paths.setdefault(step.table, paths[current.table] + steps[: i + 1])
+            if related_model not in visited:
+                visited.add(related_model)
+                queue.append(related_model)
+    joins: dict[Table, JoinStep] = {}
+    for target in targets:
+        # tables outside the relation graph are joined by foreign key inference
+        for step in paths.get(target) or [JoinStep(target, None)]:
+            joins.setdefault(step.table, step)
+    return list(joins.values())
+
+
+def join_tables(table: FromClause, joins: list[JoinStep]) -> FromClause:
+    # outer joins keep rows without related data, e.g. for OR filters
+    return reduce(
+        lambda left, step: left.outerjoin(step.table, step.onclause),
+        joins,
+        table,
+    )
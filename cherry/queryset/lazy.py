@@ -0,0 +1,32 @@
+from dataclasses import dataclass, field
+from typing import Any, TYPE_CHECKING
+
+from cherry.exception import FieldTypeError
+from cherry.fields.proxy import RelatedModelProxy
+
+if TYPE_CHECKING:
+    from cherry.models import Model
+
+
+@dataclass(eq=False)
+class SiblingGroup:
+    """the models of one query result, a relation loaded by one of them
+    is loaded for all of them at once"""
+
+    models: list["Model"]
+    loaded: set[str] = field(default_factory=set)
+
+
+def get_relation_name(model_cls: type["Model"], relation: Any) -> str:
+    meta = model_cls.__meta__
+    if isinstance(relation, RelatedModelProxy):
+        if relation.model is not model_cls:
+            raise FieldTypeError(f"{relation} is not a relation of {model_cls}")
+        relation = relation.field_name
+    if not isinstance(relation, str) or not (
+        relation in meta.related_fields
+        or relation in meta.reverse_related_fields
+        or relation in meta.many_to_many_fields
+    ):
+        raise FieldTypeError(f"{relation!r} is not a relation of {model_cls}")
+    return relation
@@ -0,0 +1,134 @@
+from collections.abc import Sequence
+from dataclasses import dataclass
+from typing import Any, Optional, TYPE_CHECKING, Union
+
+from cherry.exception import FieldTypeError
+from cherry.fields.fields import ManyToManyField, ReverseRelationshipField
+from cherry.fields.proxy import ModelClauseBase, RelatedModelProxy
+
+from sqlalchemy import and_, ColumnElement, func, Select, select
+
+if TYPE_CHECKING:
+    from .queryset import QuerySet
+
+# label of the parent key added to every prefetched row
+PARENT_KEY = "_cherry_parent_key"
+ROW_NUMBER = "_cherry_row_number"
+
+ToManyField = Union[ReverseRelationshipField, ManyToManyField]
+
+
+@dataclass
+class Prefetch:
+    """prefetch a to-many relation with a filter, an ordering and a per-parent limit
+
+    e.g. `User.select_related(Prefetch(User.posts, order_by=Post.id.desc(), limit=5))`
+
+    a queryset of the related model may carry the filter, ordering, limit,
+    `only` projection and nested prefetch instead,
+    e.g. `Prefetch(School.students, queryset=Student.filter(...).only(Student.name))`
+    """
+
+    relation: RelatedModelProxy
+    where: Any = None
+    order_by: Any = None
+    limit: Optional[int] = None
+    queryset: Optional["QuerySet"] = None
+
+    def __post_init__(self) -> None:
+        if not isinstance(self.relation, RelatedModelProxy) or not (
+            isinstance(self.relation.field, ManyToManyField)
+            or (
+                isinstance(self.relation.field, ReverseRelationshipField)
+                and self.relation.field.is_list
+            )
+        ):
+            raise FieldTypeError(
+                f"Prefetch only supports to-many relations, not {self.relation}",
+            )
+        if isinstance(self.where, ModelClauseBase):
+            self.where = self.where.binary_expression
+        if self.order_by is None:
+            self.order_by = ()
+        elif not isinstance(self.order_by, Sequence):
+            self.order_by = (self.order_by,)
+        if self.queryset is not None:
+            self._merge_queryset(self.queryset)
+        if self.limit is not None and self.limit < 1:
+            raise ValueError("limit must be positive")
+
+    def _merge_queryset(self, queryset: "QuerySet") -> None:
+        if queryset.model_cls is not self.relation.related_model:
+            raise FieldTypeError(
+                f"Prefetch queryset of {self.relation} must select"
+                f" {self.relation.related_model}, not {queryset.model_cls}",
+            )
+        options = queryset.options
+        if any(func_[0] not in ("order_by", "limit") for func_ in options.funcs):
+            raise ValueError(
+                "Prefetch queryset only supports filter, order_by, limit and only",
+            )
+        if (clause := options.get_where_clause()) is not None:
+            self.where = clause if self.where is None else and_(self.where, clause)
+        if not self.order_by:
+            self.order_by = tuple(
+                arg
+                for func_ in options.funcs
+                if func_[0] == "order_by"
+                for arg in func_[2]
+            )
+        if self.limit is None:
+            self.limit = options.get_limit()
+
+    @property
+    def field_name(self) -> str:
+        return self.relation.field_name
+
+    @property
+    def tablename(self) -> str:
+        return self.relation.related_model.tablename
+
+
+def build_to_many_select(
+    field: ToManyField,
+    parent_values: list[Any],
+    prefetch: Optional[Prefetch] = None,
+) -> Select:
+    """select the related rows of all parents at once, labelling each row with
+    its parent key, bounded per parent by ROW_NUMBER() if prefetch has a limit"""
+    related_table = field.related_model.table
+    columns = (
+        list(related_table.c)
+        if prefetch is None or prefetch.queryset is None
+        else prefetch.queryset._get_select_columns()
+    )
+    if isinstance(field, ManyToManyField):
+        m2m_table = field.table
+        parent_key: ColumnElement = m2m_table.c[field.m2m_table_field_name]
+        stat = select(*columns, parent_key.label(PARENT_KEY)).select_from(
+            m2m_table.join(
+                related_table,
+                related_table.c[field.related_field.m2m_field_name]
+                == m2m_table.c[field.related_field.m2m_table_field_name],
+            ),
+        )
+    else:
+        parent_key = related_table.c[field.related_field.foreign_key_self_name]
+        stat = select(*columns, parent_key.label(PARENT_KEY))
+    stat = stat.where(parent_key.in_(parent_values))
+    if prefetch is None:
+        return stat
+    if prefetch.where is not None:
+        stat = stat.where(prefetch.where)
+    if prefetch.limit is None:
+        return stat.order_by(*prefetch.order_by)
+    subquery = stat.add_columns(
+        func.row_number()
+        .over(partition_by=parent_key, order_by=prefetch.order_by or None)
+        .label(ROW_NUMBER),
+    ).subquery()
+    return (
+        select(*(subquery.c[c.name] for c in columns), subquery.c[PARENT_KEY])
+        .where(subquery.c[ROW_NUMBER] <= prefetch.limit)
+        .order_by(subquery.c[PARENT_KEY], subquery.c[ROW_NUMBER])
+    )
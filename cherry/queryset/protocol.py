@@ -14,5 +14,14 @@ class QuerySetProtocol(Protocol):
     async def random_one(self) -> Optional[Any]:
         ...
 
+    async def sample(self, n: int) -> list[Any]:
+        ...
+
     async def paginate(self) -> list[Any]:
         ...
+
+    async def paginate_with_total(self) -> tuple[list[Any], int]:
+        ...
+
+    async def explain(self) -> Any:
+        ...
@@ -1,7 +1,11 @@
+import asyncio
+from collections.abc import AsyncIterator, Awaitable, Iterable, Sequence
 from dataclasses import dataclass, field
 from functools import reduce
+import operator
 from typing import (
     Any,
+    Callable,
     cast,
     Generic,
     Literal,
@@ -11,17 +15,45 @@ from typing import (
 )
 from typing_extensions import Self, Unpack
 
-from cherry.exception import MultipleDataError, NoMatchDataError, PaginateArgError
+from cherry.exception import (
+    FieldTypeError,
+    MultipleDataError,
+    NoMatchDataError,
+    PaginateArgError,
+    RelatedFieldMissingError,
+)
 from cherry.fields.fields import (
     ForeignKeyField,
     ManyToManyField,
     ReverseRelationshipField,
 )
 from cherry.fields.proxy import JsonFieldClause, ModelClause
-from cherry.fields.utils import args_and_kwargs_to_clause_list, validate_fields
-from cherry.typing import ClauseListType, DictStrAny, OptionalClause, T, T_MODEL, Ts
+from cherry.fields.utils import (
+    args_and_kwargs_to_clause_list,
+    merge_update_values,
+    validate_fields,
+)
+from cherry.typing import (
+    AnyMapping,
+    ClauseListType,
+    DictStrAny,
+    ModelType,
+    OptionalClause,
+    T,
+    T_MODEL,
+    Ts,
+)
 
+from .columns import fetch_columns
+from .count import approximate_count, CountResult
+from .explain import explain_select, QueryPlan
+from .join import join_tables, JoinStep, plan_joins
+from .lazy import SiblingGroup
+from .prefetch import build_to_many_select, PARENT_KEY, Prefetch
 from .protocol import QuerySetProtocol
+from .record import get_record_class, get_record_maker, Record
+from .sample import sample_rows
+from .serializer import dump_json, get_row_serializer
 
 from sqlalchemy import (
     BinaryExpression,
@@ -29,11 +61,17 @@ from sqlalchemy import (
     Column,
     exists,
     func,
+    literal,
+    Row,
     Select,
     select,
+    tuple_,
 )
 from sqlalchemy.ext.asyncio import AsyncConnection
-from sqlalchemy.sql.operators import and_
+from sqlalchemy.sql.operators import and_, eq
+
+# label of the total count added to paginated rows
+TOTAL_KEY = "_cherry_total"
 
 
 @dataclass
@@ -53,32 +91,50 @@ class QueryOptions:
         default_factory=dict,
     )
     many_to_many_fields: dict[str, ManyToManyField] = field(default_factory=dict)
+    prefetch: dict[str, Prefetch] = field(default_factory=dict)
+    only: Optional[tuple[str, ...]] = None
+    lazy_related: bool = False
+    model_cls: Optional[ModelType] = None
+
+    def get_joins(self) -> list[JoinStep]:
+        if self.model_cls is None:
+            return []
+        return plan_joins(self.model_cls, self.clause)
+
+    def get_where_clause(self) -> OptionalClause:
+        """get a filter on the model table only, related filters are
+        moved into a primary key subquery over the planned joins"""
+        if self.model_cls is None or not (joins := self.get_joins()):
+            return self.clause
+        pk_columns = self.model_cls.get_pk_columns()
+        subquery = (
+            select(*pk_columns)
+            .select_from(join_tables(self.model_cls.table, joins))
+            .where(self.clause)  # type: ignore
+        )
+        if len(pk_columns) == 1:
+            return pk_columns[0].in_(subquery)  # type: ignore
+        return tuple_(*pk_columns).in_(subquery)  # type: ignore
 
-    def get_join(self, select_stat: Select) -> list[Any]:
-        tables = select_stat.columns_clause_froms
-        join_ = []
-        if isinstance(self.clause, BooleanClauseList):
-            for f in self.clause:
-                if isinstance(f.left, Column) and f.left.table not in tables:
-                    join_.append(f.left.table)
-                if isinstance(f.right, Column) and f.right.table not in tables:
-                    join_.append(f.right.table)
-        elif isinstance(self.clause, BinaryExpression):
-            if (
-                isinstance(self.clause.left, Column)
-                and self.clause.left.table not in tables
-            ):
-                join_.append(self.clause.left.table)
-            if (
-                isinstance(self.clause.right, Column)
-                and self.clause.right.table not in tables
-            ):
-                join_.append(self.clause.right.table)
-        return [j for j in join_ if j is not None]
-
-    def as_select_option(self, select_stat: Select):
-        if self.clause is not None:
-            select_stat = select_stat.where(self.clause)
+    def get_limit(self) -> Optional[int]:
+        limit = None
+        for func_ in self.funcs:
+            if func_[0] == "limit":
+                limit = func_[2]
+        return limit
+
+    def as_select_option(self, select_stat: Select, limit: Optional[int] = None):
+        joins = self.get_joins()
+        if any(join.many for join in joins):
+            # joining a to-many relation would repeat rows
+            select_stat = select_stat.where(self.get_where_clause())  # type: ignore
+        else:
+            if joins:
+                select_stat = select_stat.select_from(
+                    join_tables(self.model_cls.table, joins),  # type: ignore
+                )
+            if self.clause is not None:
+                select_stat = select_stat.where(self.clause)
         for func_ in self.funcs:
             if func_[0] == "distinct":
                 select_stat = select_stat.distinct()
@@ -86,6 +142,11 @@ class QueryOptions:
                 select_stat = getattr(select_stat, func_[0])(*func_[2])
             else:
                 select_stat = getattr(select_stat, func_[0])(func_[2])
+        if limit is not None:
+            # never read more rows than the user limit allows
+            if (user_limit := self.get_limit()) is not None:
+                limit = min(limit, user_limit)
+            select_stat = select_stat.limit(limit)
         # if self.group_by:
         #     select_stat = select_stat.group_by(*self.group_by)
         # if self.order_by:
@@ -96,10 +157,49 @@ class QueryOptions:
         #     select_stat = select_stat.offset(self.offset)
         # if self.distinct:
         #     select_stat = select_stat.distinct()
-        if join_ := self.get_join(select_stat):
-            select_stat = select_stat.join(*join_)
         return select_stat
 
+    def as_subquery_option(self, select_stat: Select) -> Select:
+        """build a standalone subquery for use inside other filters,
+        the ordering is dropped unless limit/offset depend on it"""
+        select_stat = self.as_select_option(select_stat)
+        if not any(func_[0] in ("limit", "offset") for func_ in self.funcs):
+            select_stat = select_stat.order_by(None)
+        return select_stat.correlate(None)
+
+
+async def fetch_page_with_total(
+    conn: AsyncConnection,
+    options: QueryOptions,
+    select_stat: Select,
+    page: int,
+    page_size: int,
+) -> tuple[list[Row], int]:
+    """fetch one page together with the total count of select_stat,
+    every row carries the total as its last column labelled TOTAL_KEY"""
+    if page < 1 or page_size < 1:
+        raise PaginateArgError("page and page_size must be positive")
+    page_stat = select_stat.limit(page_size).offset((page - 1) * page_size)
+    if not any(func_[0] == "distinct" for func_ in options.funcs):
+        result = await conn.execute(
+            page_stat.add_columns(func.count().over().label(TOTAL_KEY)),
+        )
+        if (rows := result.fetchall()) or page == 1:
+            return rows, rows[0][-1] if rows else 0
+    # the window is evaluated before DISTINCT and empty pages carry no total,
+    # so count the rows separately
+    total = (
+        await conn.execute(
+            select(func.count()).select_from(select_stat.order_by(None).subquery()),
+        )
+    ).scalar_one()
+    if total <= (page - 1) * page_size:
+        return [], total
+    result = await conn.execute(
+        page_stat.add_columns(literal(total).label(TOTAL_KEY)),
+    )
+    return list(result.fetchall()), total
+
 
 class QuerySet(QuerySetProtocol, Generic[T_MODEL]):
     def __init__(
@@ -113,6 +213,7 @@ class QuerySet(QuerySetProtocol, Generic[T_MODEL]):
         final_clause = self._parse_clause(*args, **kwargs)
         self.options = QueryOptions(
             clause=cast(OptionalClause, final_clause),
+            model_cls=model_cls,
         )
 
     def filter(self, *args: Any, **kwargs: Any) -> Self:
@@ -148,8 +249,27 @@ class QuerySet(QuerySetProtocol, Generic[T_MODEL]):
         self.options.funcs.append(("offset", False, num))
         return self
 
+    def only(self, *fields: Any) -> Self:
+        self.options.only = tuple(self.model_cls._get_column_names(*fields))
+        return self
+
+    def lazy_related(self, is_: bool = True) -> Self:
+        self.options.lazy_related = is_
+        return self
+
     def prefetch_related(self, *args: Any) -> Self:
-        table_names = self.model_cls._get_related_tables(*args)
+        prefetches = [arg for arg in args if isinstance(arg, Prefetch)]
+        for prefetch in prefetches:
+            if prefetch.relation.model is not self.model_cls:
+                raise FieldTypeError(
+                    f"{prefetch.relation} is not a relation of {self.model_cls}",
+                )
+        self.options.prefetch = {
+            prefetch.field_name: prefetch for prefetch in prefetches
+        }
+        table_names = self.model_cls._get_related_tables(
+            *(arg.tablename if isinstance(arg, Prefetch) else arg for arg in args),
+        )
 
         self.options.related_fields = (
             self.model_cls.__meta__.related_fields
@@ -225,57 +345,51 @@ class QuerySet(QuerySetProtocol, Generic[T_MODEL]):
     ) -> "CoalesceQuerySet[Unpack[Ts]]":
         return CoalesceQuerySet(*column, model_cls=self.model_cls, options=self.options)
 
+    def as_records(self) -> "RecordQuerySet":
+        return RecordQuerySet(
+            model_cls=self.model_cls,
+            options=self.options,
+            columns=self._get_select_columns(),
+        )
+
     async def first(self) -> Optional[T_MODEL]:
         async with self.model_cls.database as conn:
-            result = await conn.execute(
-                self.options.as_select_option(self.model_cls.table.select()),
-            )
+            result = await conn.execute(self._build_select(limit=1))
             if result_one := result.fetchone():
-                data = result_one._asdict()
+                data = self._map_rows([result_one])[0]
                 await self._fetch_one_related(conn, data)
 
-                return self.model_cls.parse_from_db_dict(data)
+                return self._parse_model(data)
 
         return None
 
     async def get(self) -> T_MODEL:
         async with self.model_cls.database as conn:
-            result = await conn.execute(
-                self.options.as_select_option(self.model_cls.table.select()),
-            )
+            result = await conn.execute(self._build_select(limit=2))
             results = result.fetchall()
             if len(results) > 1:
                 raise MultipleDataError(
-                    f"{self.model_cls} expect one data, but got {len(results)} datas",
+                    f"{self.model_cls} expect one data, but got multiple datas",
                 )
             if len(results) == 1:
-                data = results[0]._asdict()
+                data = self._map_rows(results)[0]
                 await self._fetch_one_related(conn, data)
-                return self.model_cls.parse_from_db_dict(data)
+                return self._parse_model(data)
             raise NoMatchDataError(f"No match data for {self.model_cls}")
 
     async def all(self) -> list[T_MODEL]:
         async with self.model_cls.database as conn:
-            result = await conn.execute(
-                self.options.as_select_option(self.model_cls.table.select()),
-            )
-            data = [data._asdict() for data in result.fetchall()]
-            await self._fetch_many_related(conn, data)
-
-            return [self.model_cls.parse_from_db_dict(data) for data in data]
+            result = await conn.execute(self._build_select())
+            return await self._parse_rows_in_chunks(conn, result.fetchall())
 
     async def random_one(self) -> Optional[T_MODEL]:
+        results = await self.sample(1)
+        return results[0] if results else None
+
+    async def sample(self, n: int) -> list[T_MODEL]:
         async with self.model_cls.database as conn:
-            result = await conn.execute(
-                self.options.as_select_option(
-                    self.model_cls.table.select().order_by(func.random()),
-                ),
-            )  # type: ignore
-            if result_one := result.fetchone():
-                data = result_one._asdict()
-                await self._fetch_one_related(conn, data)
-                return self.model_cls.parse_from_db_dict(data)
-            return None
+            rows = await self._sample_rows(conn, n)
+            return await self._parse_rows_in_chunks(conn, rows)
 
     async def paginate(self, page: int, page_size: int) -> list[T_MODEL]:
         if page < 1 or page_size < 1:
@@ -286,35 +400,207 @@ class QuerySet(QuerySetProtocol, Generic[T_MODEL]):
         self.options.funcs.append(("offset", False, (page - 1) * page_size))
         return await self.all()
 
-    async def delete(self) -> int:
+    async def paginate_with_total(
+        self,
+        page: int,
+        page_size: int,
+    ) -> tuple[list[T_MODEL], int]:
         async with self.model_cls.database as conn:
-            stat = self.model_cls.table.delete()
-            if self.options.clause is not None:
-                stat = stat.where(self.options.clause)
+            rows, total = await fetch_page_with_total(
+                conn,
+                self.options,
+                self._build_select(),
+                page,
+                page_size,
+            )
+            # the total is the last column and is left out of the mapped dicts
+            keys = rows[0]._fields[:-1] if rows else ()
+            return await self._parse_rows_in_chunks(conn, rows, keys), total
+
+    async def to_json(self) -> bytes:
+        async with self.model_cls.database as conn:
+            result = await conn.execute(self._build_select())
+            data = self._map_rows(result.fetchall())
+            await self._fetch_many_related(conn, data)
+        serialize = get_row_serializer(self.model_cls)
+        return dump_json(self.model_cls, [serialize(one) for one in data])
+
+    async def stream_json(self, batch_size: int = 1000) -> AsyncIterator[bytes]:
+        if batch_size < 1:
+            raise ValueError("batch_size must be positive")
+        serialize = get_row_serializer(self.model_cls)
+        # the shared connection is held until the stream is exhausted or closed,
+        # a stream left early must be closed with `aclose()` (or
+        # `contextlib.aclosing`), otherwise the later operations of the task
+        # are not committed until it is garbage collected
+        async with self.model_cls.database as conn:
+            result = await conn.stream(self._build_select())
+            try:
+                async for partition in result.partitions(batch_size):
+                    data = self._map_rows(partition)
+                    await self._fetch_many_related(conn, data)
+                    # one NDJSON chunk per batch
+                    yield b"".join(
+                        dump_json(self.model_cls, serialize(one)) + b"\n"
+                        for one in data
+                    )
+            except GeneratorExit:
+                # closing a read early is not an error, the operations sharing
+                # the connection meanwhile must be committed, not rolled back
+                await result.close()
+
+    async def delete(
+        self,
+        *,
+        batch_size: Optional[int] = None,
+        pause: float = 0,
+        progress: Optional[Callable[[int], Any]] = None,
+    ) -> int:
+        table = self.model_cls.table
+
+        async def execute(conn: AsyncConnection, clause: OptionalClause) -> int:
+            stat = table.delete()
+            if clause is not None:
+                stat = stat.where(clause)
             result = await conn.execute(stat)
             return result.rowcount
 
-    async def update(self, **kwargs: Any) -> int:
-        values = validate_fields(self.model_cls, kwargs)
+        if batch_size is not None:
+            return await self._execute_in_batches(execute, batch_size, pause, progress)
         async with self.model_cls.database as conn:
-            result = await conn.execute(
-                self.model_cls.table.update().values(**values),
+            return await execute(conn, self.options.get_where_clause())
+
+    @overload
+    async def update(
+        self,
+        values: Optional[AnyMapping] = None,
+        /,
+        *,
+        returning: Literal[False] = False,
+        batch_size: Optional[int] = None,
+        pause: float = 0,
+        progress: Optional[Callable[[int], Any]] = None,
+        **kwargs: Any,
+    ) -> int:
+        ...
+
+    @overload
+    async def update(
+        self,
+        values: Optional[AnyMapping] = None,
+        /,
+        *,
+        returning: Literal[True],
+        batch_size: Optional[int] = None,
+        pause: float = 0,
+        progress: Optional[Callable[[int], Any]] = None,
+        **kwargs: Any,
+    ) -> list[T_MODEL]:
+        ...
+
+    async def update(
+        self,
+        values: Optional[AnyMapping] = None,
+        /,
+        *,
+        returning: bool = False,
+        batch_size: Optional[int] = None,
+        pause: float = 0,
+        progress: Optional[Callable[[int], Any]] = None,
+        **kwargs: Any,
+    ) -> Union[int, list[T_MODEL]]:
+        given_options = [
+            name
+            for name, is_given in (
+                ("returning", returning),
+                ("batch_size", batch_size is not None),
+                ("pause", pause != 0),
+                ("progress", progress is not None),
             )
-            return result.rowcount
+            if is_given
+        ]
+        values = validate_fields(
+            self.model_cls,
+            merge_update_values(self.model_cls, values, kwargs, given_options),
+        )
+        if not values:
+            raise ValueError("update needs at least one value")
+        table = self.model_cls.table
+        models: list[T_MODEL] = []
+
+        async def execute(conn: AsyncConnection, clause: OptionalClause) -> int:
+            stat = table.update().values(**values)
+            if clause is not None:
+                stat = stat.where(clause)
+            if not returning:
+                result = await conn.execute(stat)
+                return result.rowcount
+            if conn.dialect.update_returning:
+                result = await conn.execute(stat.returning(*table.columns))
+            else:
+                # the filter may not match after update, so lock in primary keys first
+                pk_stat = select(*self.model_cls.get_pk_columns())
+                if clause is not None:
+                    pk_stat = pk_stat.where(clause)
+                pk_values = (await conn.execute(pk_stat)).fetchall()
+                if not pk_values:
+                    return 0
+                pk_filter = self.model_cls.get_pk_in_filter(pk_values)
+                await conn.execute(table.update().where(pk_filter).values(**values))
+                result = await conn.execute(table.select().where(pk_filter))
+            updated = self.model_cls.parse_many_from_db_dict(
+                self._map_rows(result.fetchall()),
+            )
+            models.extend(updated)
+            return len(updated)
+
+        if batch_size is not None:
+            rowcount = await self._execute_in_batches(
+                execute,
+                batch_size,
+                pause,
+                progress,
+            )
+        else:
+            async with self.model_cls.database as conn:
+                rowcount = await execute(conn, self.options.get_where_clause())
+        return models if returning else rowcount
+
+    @overload
+    async def count(self, *, approximate: Literal[False] = False) -> int:
+        ...
+
+    @overload
+    async def count(self, *, approximate: Literal[True]) -> CountResult:
+        ...
 
-    async def count(self) -> int:
+    async def count(self, *, approximate: bool = False) -> Union[int, CountResult]:
         async with self.model_cls.database as conn:
+            clause = self.options.get_where_clause()
+            if approximate and not self.options.get_joins():
+                # statistics only cover filters on the table itself
+                stat = select(*self.model_cls.get_pk_columns())
+                if clause is not None:
+                    stat = stat.where(clause)
+                result = await approximate_count(
+                    conn,
+                    self.model_cls.table,
+                    stat,
+                    set() if clause is None else self._get_equal_columns(),
+                )
+                if result is not None:
+                    return result
             stat = select(func.count()).select_from(self.model_cls.table)
-            if self.options.clause is not None:
-                stat = stat.where(self.options.clause)
-            result = await conn.execute(stat)
-            return result.scalar()  # type: ignore
+            if clause is not None:
+                stat = stat.where(clause)
+            count = (await conn.execute(stat)).scalar_one()
+            return CountResult(count, "exact") if approximate else count
 
     async def exists(self) -> bool:
         async with self.model_cls.database as conn:
             stat = exists().select_from(self.model_cls.table)
-            if self.options.clause is not None:
-                stat = stat.where(self.options.clause)
+            if (clause := self.options.get_where_clause()) is not None:
+                stat = stat.where(clause)
             result = await conn.execute(
                 select(stat),
             )
@@ -357,52 +643,15 @@ class QuerySet(QuerySetProtocol, Generic[T_MODEL]):
             return result.scalar()
 
     async def _fetch_one_related(self, conn: AsyncConnection, now_data: dict[str, Any]):
-        for name, rfield in self.options.related_fields.items():
-            related_data = await conn.execute(
-                rfield.related_model.__meta__.table.select().where(
-                    getattr(rfield.related_model, rfield.foreign_key)
-                    == now_data[rfield.foreign_key_self_name],
-                ),
-            )
-            if related_one := related_data.fetchone():
-                now_data[name] = related_one._asdict()
-        for name, rfield in self.options.reverse_related_fields.items():
-            target_field = rfield.related_field
-            related_data = await conn.execute(
-                rfield.related_model.__meta__.table.select().where(
-                    getattr(
-                        rfield.related_model,
-                        rfield.related_field.foreign_key_self_name,
-                    )
-                    == now_data[target_field.foreign_key],
-                ),
-            )
-            if rfield.is_list:
-                now_data[name] = [
-                    related_one._asdict() for related_one in related_data.fetchall()
-                ]
-            else:
-                if related_one := related_data.fetchone():
-                    now_data[name] = related_one._asdict()
-        for name, rfield in self.options.many_to_many_fields.items():
-            related_data = await conn.execute(
-                rfield.table.select().where(
-                    getattr(
-                        rfield.table.c,
-                        rfield.m2m_table_field_name,
-                    )
-                    == getattr(self.model_cls, rfield.m2m_field_name),
-                ),
-            )
-            now_data[name] = [
-                related_one._asdict() for related_one in related_data.fetchall()
-            ]
+        await self._fetch_many_related(conn, [now_data])
 
     async def _fetch_many_related(
         self,
         conn: AsyncConnection,
         now_datas: list[dict[str, Any]],
     ):
+        if not now_datas:
+            return
         for name, rfield in self.options.related_fields.items():
             related_values = [data[rfield.foreign_key_self_name] for data in now_datas]
             related_data = await conn.execute(
@@ -412,7 +661,10 @@ class QuerySet(QuerySetProtocol, Generic[T_MODEL]):
                     ),
                 ),
             )
-            related_datas = [rd._asdict() for rd in related_data.fetchall()]
+            related_datas = rfield.related_model.__meta__.row_mapper.map_rows(
+                related_data.keys(),
+                related_data.fetchall(),
+            )
             related_datas_dict = {
                 data[rfield.foreign_key]: data for data in related_datas
             }
@@ -427,45 +679,256 @@ class QuerySet(QuerySetProtocol, Generic[T_MODEL]):
                     )
         for name, rfield in self.options.reverse_related_fields.items():
             target_field = rfield.related_field
-            related_values = [data[target_field.foreign_key] for data in now_datas]
-            related_data = await conn.execute(
-                rfield.related_model.__meta__.table.select().where(
-                    getattr(
-                        rfield.related_model,
-                        rfield.related_field.foreign_key_self_name,
-                    ).in_(related_values),
-                ),
+            related_datas = await self._fetch_to_many_related(
+                conn,
+                name,
+                rfield,
+                [data[target_field.foreign_key] for data in now_datas],
             )
-            related_datas = [rd._asdict() for rd in related_data.fetchall()]
             for data in now_datas:
-                rd = [
-                    related_data
-                    for related_data in related_datas
-                    if related_data[target_field.foreign_key_self_name]
-                    == data[target_field.foreign_key]
-                ]
+                rd = related_datas.get(data[target_field.foreign_key], [])
                 if rfield.is_list:
                     data[name] = rd
                 elif rd:
                     data[name] = rd[0]
         for name, rfield in self.options.many_to_many_fields.items():
-            related_values = [data[rfield.m2m_field_name] for data in now_datas]
-            related_data = await conn.execute(
-                rfield.table.select().where(
-                    getattr(
-                        rfield.table.c,
-                        rfield.m2m_table_field_name,
-                    ).in_(related_values),
-                ),
+            related_datas = await self._fetch_to_many_related(
+                conn,
+                name,
+                rfield,
+                [data[rfield.m2m_field_name] for data in now_datas],
             )
-            related_datas = [rd._asdict() for rd in related_data.fetchall()]
             for data in now_datas:
-                data[name] = [
-                    related_data
-                    for related_data in related_datas
-                    if related_data[rfield.m2m_table_field_name]
-                    == data[rfield.m2m_field_name]
-                ]
+                data[name] = related_datas.get(data[rfield.m2m_field_name], [])
+
+    async def _fetch_to_many_related(
+        self,
+        conn: AsyncConnection,
+        name: str,
+        rfield: Union[ReverseRelationshipField, ManyToManyField],
+        related_values: list[Any],
+    ) -> dict[Any, list[dict[str, Any]]]:
+        result = await conn.execute(
+            build_to_many_select(
+                rfield,
+                list(set(related_values)),
+                self.options.prefetch.get(name),
+            ),
+        )
+        related_datas: dict[Any, list[Any]] = {}
+        map_row = rfield.related_model.__meta__.row_mapper.get(result.keys())
+        for related_one in result.fetchall():
+            related_data = map_row(related_one)
+            related_datas.setdefault(related_data.pop(PARENT_KEY), []).append(
+                related_data,
+            )
+        prefetch = self.options.prefetch.get(name)
+        if prefetch is None or (queryset := prefetch.queryset) is None:
+            return related_datas
+        await queryset._fetch_many_related(
+            conn,
+            [data for datas in related_datas.values() for data in datas],
+        )
+        if queryset.options.only is not None:
+            # partial models can not be validated as nested dicts
+            related_datas = {
+                key: queryset._parse_models(datas)
+                for key, datas in related_datas.items()
+            }
+            queryset._set_siblings(
+                [model for models in related_datas.values() for model in models],
+            )
+        return related_datas
+
+    def _get_select_columns(self) -> list[Column]:
+        table = self.model_cls.table
+        if self.options.only is None:
+            return list(table.c)
+        # keep the keys needed to identify models and fetch their relations
+        names = {
+            *self.model_cls.__meta__.primary_key,
+            *self.options.only,
+            *(f.foreign_key_self_name for f in self.options.related_fields.values()),
+            *(
+                f.related_field.foreign_key
+                for f in self.options.reverse_related_fields.values()
+            ),
+            *(f.m2m_field_name for f in self.options.many_to_many_fields.values()),
+        }
+        return [column for column in table.c if column.name in names]
+
+    def _map_rows(
+        self,
+        rows: Sequence[Row],
+        keys: Optional[Iterable[str]] = None,
+    ) -> list[dict[str, Any]]:
+        if not rows:
+            return []
+        return self.model_cls.__meta__.row_mapper.map_rows(
+            rows[0]._fields if keys is None else keys,
+            rows,
+        )
+
+    async def _parse_rows_in_chunks(
+        self,
+        conn: AsyncConnection,
+        rows: Sequence[Row],
+        keys: Optional[Iterable[str]] = None,
+    ) -> list[T_MODEL]:
+        meta = self.model_cls.__meta__
+        chunk_size = meta.hydration_chunk_size
+        if chunk_size is None or len(rows) <= chunk_size:
+            datas = self._map_rows(rows, keys)
+            await self._fetch_many_related(conn, datas)
+            return self._set_siblings(self._parse_models(datas))
+        # mapping, fetching the relations of and validating a large result
+        # at once blocks the event loop, so each chunk of rows goes through
+        # all of them and the loop gets control back in between
+        models: list[T_MODEL] = []
+        for i in range(0, len(rows), chunk_size):
+            datas = self._map_rows(rows[i : i + chunk_size], keys)
+            await asyncio.sleep(0)
+            await self._fetch_many_related(conn, datas)
+            if meta.hydration_offload == "thread":
+                models.extend(await asyncio.to_thread(self._parse_models, datas))
+            else:
+                models.extend(self._parse_models(datas))
+                await asyncio.sleep(0)
+        # one group for the whole result, not one per chunk
+        return self._set_siblings(models)
+
+    def _parse_models(self, datas: list[dict[str, Any]]) -> list[T_MODEL]:
+        if self.options.only is None:
+            return self.model_cls.parse_many_from_db_dict(datas)
+        return self.model_cls.parse_partial_many_from_db_dict(datas)
+
+    def _set_siblings(self, models: list[T_MODEL]) -> list[T_MODEL]:
+        if self.options.lazy_related and models:
+            group = SiblingGroup(
+                models,  # type: ignore
+                {
+                    *self.options.related_fields,
+                    *self.options.reverse_related_fields,
+                    *self.options.many_to_many_fields,
+                },
+            )
+            for model in models:
+                model._cherry_siblings_ = group
+        return models
+
+    async def _load_relation(self, models: list[T_MODEL], name: str) -> None:
+        meta = self.model_cls.__meta__
+        options = self.options
+        options.related_fields = {
+            k: v for k, v in meta.related_fields.items() if k == name
+        }
+        options.reverse_related_fields = {
+            k: v for k, v in meta.reverse_related_fields.items() if k == name
+        }
+        options.many_to_many_fields = {
+            k: v for k, v in meta.many_to_many_fields.items() if k == name
+        }
+        if name in meta.related_fields:
+            key = meta.related_fields[name].foreign_key_self_name
+            is_missing = any(
+                key not in model._cherry_foreign_key_values_ for model in models
+            )
+        else:
+            key = (
+                meta.many_to_many_fields[name].m2m_field_name
+                if name in meta.many_to_many_fields
+                else meta.reverse_related_fields[name].related_field.foreign_key
+            )
+            is_missing = any(getattr(model, key, None) is None for model in models)
+        if is_missing:
+            raise RelatedFieldMissingError(
+                "Can not fetch related model if not been inserted into or"
+                " fetched from database",
+            )
+        datas = [
+            {**model._cherry_foreign_key_values_, **model.__dict__} for model in models
+        ]
+        async with self.model_cls.database as conn:
+            await self._fetch_many_related(conn, datas)
+        for model, data in zip(models, datas):
+            # validated by assignment like the nested relations of a result
+            setattr(
+                model,
+                name,
+                data.get(name)
+                if name in data
+                else self.model_cls.model_fields[name].get_default(
+                    call_default_factory=True,
+                ),
+            )
+
+    def _parse_model(self, data: dict[str, Any]) -> T_MODEL:
+        if self.options.only is None:
+            return self.model_cls.parse_from_db_dict(data)
+        return self.model_cls.parse_partial_from_db_dict(data)
+
+    async def explain(self, analyze: bool = False) -> QueryPlan:
+        async with self.model_cls.database as conn:
+            return await explain_select(conn, self._build_select(), analyze)
+
+    def __clause_element__(self) -> Select:
+        # used as a subquery, e.g. Post.author_id.in_(User.filter(...))
+        return self.options.as_subquery_option(
+            select(*self.model_cls.get_pk_columns()),
+        )
+
+    def _build_select(self, limit: Optional[int] = None) -> Select:
+        return self.options.as_select_option(
+            select(*self._get_select_columns()),
+            limit=limit,
+        )
+
+    async def _sample_rows(self, conn: AsyncConnection, n: int) -> list[Row]:
+        return await sample_rows(
+            conn,
+            self.model_cls.table,
+            self.options,
+            self._build_select(),
+            n,
+        )
+
+    async def _execute_in_batches(
+        self,
+        execute: Callable[[AsyncConnection, OptionalClause], Awaitable[int]],
+        batch_size: int,
+        pause: float,
+        progress: Optional[Callable[[int], Any]],
+    ) -> int:
+        if batch_size < 1:
+            raise ValueError("batch_size must be positive")
+        pk_columns = self.model_cls.get_pk_columns()
+        clause = self.options.get_where_clause()
+        rowcount = 0
+        last_pk_value = None
+        while True:
+            stat = select(*pk_columns).order_by(*pk_columns).limit(batch_size)
+            if clause is not None:
+                stat = stat.where(clause)
+            if last_pk_value is not None:
+                stat = stat.where(tuple_(*pk_columns) > tuple_(*last_pk_value))
+            # every batch runs in its own transaction, so locks are released
+            # between batches unless the caller already holds the connection
+            async with self.model_cls.database as conn:
+                pk_values = (await conn.execute(stat)).fetchall()
+                if not pk_values:
+                    break
+                rowcount += await execute(
+                    conn,
+                    self.model_cls.get_pk_in_filter(pk_values),
+                )
+            if progress is not None:
+                progress(rowcount)
+            if len(pk_values) < batch_size:
+                break
+            last_pk_value = pk_values[-1]
+            if pause > 0:
+                await asyncio.sleep(pause)
+        return rowcount
 
     def _parse_clause(self, *args: Any, **kwargs: Any):
         clause_list = args_and_kwargs_to_clause_list(self.model_cls, args, kwargs)
@@ -486,6 +949,34 @@ class QuerySet(QuerySetProtocol, Generic[T_MODEL]):
             final_clause = None
         return cast(OptionalClause, final_clause)
 
+    def _get_equal_columns(self) -> Optional[set[str]]:
+        """get names of the columns filtered by equality,
+        None if any filter condition is not a plain equality"""
+        columns = set()
+        clauses = []
+        for clause in self.raw_claust_list:
+            if isinstance(clause, BooleanClauseList) and clause.operator is and_:
+                clauses.extend(clause)
+            else:
+                clauses.append(clause)
+        for clause in clauses:
+            if (
+                isinstance(clause, ModelClause)
+                and isinstance(clause.field, ForeignKeyField)
+                and clause.op is operator.eq
+            ):
+                columns.add(clause.field.foreign_key_self_name)
+            elif (
+                isinstance(clause, BinaryExpression)
+                and clause.operator is eq
+                and isinstance(clause.left, Column)
+                and clause.left.table is self.model_cls.table
+            ):
+                columns.add(clause.left.name)
+            else:
+                return None
+        return columns
+
     def _clause_list_to_dict(self) -> DictStrAny:
         data = {}
         for clause in self.raw_claust_list:
@@ -517,41 +1008,36 @@ class ValuesQuerySet(QuerySetProtocol, Generic[T, Unpack[Ts]]):
 
     async def first(self) -> Optional[tuple[T, Unpack[Ts]]]:
         async with self.model_cls.database as conn:
-            result = await conn.execute(
-                self.options.as_select_option(select(self.query1, *self.querys)),  # type: ignore
-            )
+            result = await conn.execute(self._build_select(limit=1))
             if result_one := result.fetchone():
                 return result_one._tuple()
             return None
 
     async def get(self) -> tuple[T, Unpack[Ts]]:
         async with self.model_cls.database as conn:
-            results = await self.all()
-            if len(results) > 1:
-                raise MultipleDataError(
-                    f"{self.model_cls} expect one data, but got {len(results)} datas",
-                )
-            if len(results) == 1:
-                return results[0]
-            raise NoMatchDataError(f"No match data for {self.model_cls}")
+            result = await conn.execute(self._build_select(limit=2))
+            results = result.fetchall()
+        if len(results) > 1:
+            raise MultipleDataError(
+                f"{self.model_cls} expect one data, but got multiple datas",
+            )
+        if len(results) == 1:
+            return results[0]._tuple()
+        raise NoMatchDataError(f"No match data for {self.model_cls}")
 
     async def all(self) -> list[tuple[T, Unpack[Ts]]]:
         async with self.model_cls.database as conn:
-            result = await conn.execute(
-                self.options.as_select_option(select(self.query1, *self.querys)),  # type: ignore
-            )
+            result = await conn.execute(self._build_select())
             return [result_one._tuple() for result_one in result.fetchall()]
 
     async def random_one(self) -> Optional[tuple[T, Unpack[Ts]]]:
+        results = await self.sample(1)
+        return results[0] if results else None
+
+    async def sample(self, n: int) -> list[tuple[T, Unpack[Ts]]]:
         async with self.model_cls.database as conn:
-            result = await conn.execute(
-                self.options.as_select_option(
-                    select(self.query1, *self.querys).order_by(func.random()),  # type: ignore
-                ),
-            )
-            if result_one := result.fetchone():
-                return result_one._tuple()
-            return None
+            rows = await self._sample_rows(conn, n)
+            return [row._tuple() for row in rows]
 
     async def paginate(self, page: int, page_size: int) -> list[tuple[T, Unpack[Ts]]]:
         if page < 1 or page_size < 1:
@@ -562,6 +1048,49 @@ class ValuesQuerySet(QuerySetProtocol, Generic[T, Unpack[Ts]]):
         self.options.funcs.append(("offset", False, (page - 1) * page_size))
         return await self.all()
 
+    async def paginate_with_total(
+        self,
+        page: int,
+        page_size: int,
+    ) -> tuple[list[tuple[T, Unpack[Ts]]], int]:
+        async with self.model_cls.database as conn:
+            rows, total = await fetch_page_with_total(
+                conn,
+                self.options,
+                self._build_select(),
+                page,
+                page_size,
+            )
+            return [row._tuple()[:-1] for row in rows], total
+
+    async def columns(self, numpy: bool = False) -> dict[str, Any]:
+        async with self.model_cls.database as conn:
+            return await fetch_columns(conn, self._build_select(), numpy)
+
+    async def explain(self, analyze: bool = False) -> QueryPlan:
+        async with self.model_cls.database as conn:
+            return await explain_select(conn, self._build_select(), analyze)
+
+    def __clause_element__(self) -> Select:
+        return self.options.as_subquery_option(
+            select(self.query1, *self.querys),  # type: ignore
+        )
+
+    def _build_select(self, limit: Optional[int] = None) -> Select:
+        return self.options.as_select_option(
+            select(self.query1, *self.querys),  # type: ignore
+            limit=limit,
+        )
+
+    async def _sample_rows(self, conn: AsyncConnection, n: int) -> list[Row]:
+        return await sample_rows(
+            conn,
+            self.model_cls.table,
+            self.options,
+            self._build_select(),
+            n,
+        )
+
 
 class ValueQuerySet(QuerySetProtocol, Generic[T]):
     def __init__(
@@ -576,40 +1105,36 @@ class ValueQuerySet(QuerySetProtocol, Generic[T]):
 
     async def first(self) -> Optional[T]:
         async with self.model_cls.database as conn:
-            result = await conn.execute(
-                self.options.as_select_option(select(self.query)),  # type: ignore
-            )
+            result = await conn.execute(self._build_select(limit=1))
             if result_one := result.fetchone():
                 return result_one._tuple()[0]
             return None
 
     async def get(self) -> T:
-        results = await self.all()
+        async with self.model_cls.database as conn:
+            result = await conn.execute(self._build_select(limit=2))
+            results = result.fetchall()
         if len(results) > 1:
             raise MultipleDataError(
-                f"{self.model_cls} expect one data, but got {len(results)} datas",
+                f"{self.model_cls} expect one data, but got multiple datas",
             )
         if len(results) == 1:
-            return results[0]
+            return results[0]._tuple()[0]
         raise NoMatchDataError(f"No match data for {self.model_cls}")
 
     async def all(self) -> list[T]:
         async with self.model_cls.database as conn:
-            result = await conn.execute(
-                self.options.as_select_option(select(self.query)),  # type: ignore
-            )
+            result = await conn.execute(self._build_select())
             return [result_one._tuple()[0] for result_one in result.fetchall()]
 
     async def random_one(self) -> Optional[T]:
+        results = await self.sample(1)
+        return results[0] if results else None
+
+    async def sample(self, n: int) -> list[T]:
         async with self.model_cls.database as conn:
-            result = await conn.execute(
-                self.options.as_select_option(select(self.query)).order_by(  # type: ignore
-                    func.random(),
-                ),
-            )
-            if result_one := result.fetchone():
-                return result_one._tuple()[0]
-            return None
+            rows = await self._sample_rows(conn, n)
+            return [row._tuple()[0] for row in rows]
 
     async def paginate(self, page: int, page_size: int) -> list[T]:
         if page < 1 or page_size < 1:
@@ -620,6 +1145,45 @@ class ValueQuerySet(QuerySetProtocol, Generic[T]):
         self.options.funcs.append(("offset", False, (page - 1) * page_size))
         return await self.all()
 
+    async def paginate_with_total(
+        self,
+        page: int,
+        page_size: int,
+    ) -> tuple[list[T], int]:
+        async with self.model_cls.database as conn:
+            rows, total = await fetch_page_with_total(
+                conn,
+                self.options,
+                self._build_select(),
+                page,
+                page_size,
+            )
+            return [row[0] for row in rows], total
+
+    async def explain(self, analyze: bool = False) -> QueryPlan:
+        async with self.model_cls.database as conn:
+            return await explain_select(conn, self._build_select(), analyze)
+
+    def __clause_element__(self) -> Select:
+        return self.options.as_subquery_option(
+            select(self.query),  # type: ignore
+        )
+
+    def _build_select(self, limit: Optional[int] = None) -> Select:
+        return self.options.as_select_option(
+            select(self.query),  # type: ignore
+            limit=limit,
+        )
+
+    async def _sample_rows(self, conn: AsyncConnection, n: int) -> list[Row]:
+        return await sample_rows(
+            conn,
+            self.model_cls.table,
+            self.options,
+            self._build_select(),
+            n,
+        )
+
 
 class ValueDictQuerySet(QuerySetProtocol):
     def __init__(
@@ -634,40 +1198,36 @@ class ValueDictQuerySet(QuerySetProtocol):
 
     async def first(self) -> Optional[dict[str, Any]]:
         async with self.model_cls.database as conn:
-            result = await conn.execute(
-                self.options.as_select_option(select(*self.querys)),
-            )
+            result = await conn.execute(self._build_select(limit=1))
             if result_one := result.fetchone():
-                return result_one._asdict()
+                return self._map_rows([result_one])[0]
             return None
 
     async def get(self) -> dict[str, Any]:
-        results = await self.all()
+        async with self.model_cls.database as conn:
+            result = await conn.execute(self._build_select(limit=2))
+            results = result.fetchall()
         if len(results) > 1:
             raise MultipleDataError(
-                f"{self.model_cls} expect one data, but got {len(results)} datas",
+                f"{self.model_cls} expect one data, but got multiple datas",
             )
         if len(results) == 1:
-            return results[0]
+            return self._map_rows(results)[0]
         raise NoMatchDataError(f"No match data for {self.model_cls}")
 
     async def all(self) -> list[dict[str, Any]]:
         async with self.model_cls.database as conn:
-            result = await conn.execute(
-                self.options.as_select_option(select(*self.querys)),
-            )
-            return [result_one._asdict() for result_one in result.fetchall()]
+            result = await conn.execute(self._build_select())
+            return self._map_rows(result.fetchall())
 
     async def random_one(self) -> Optional[dict[str, Any]]:
+        results = await self.sample(1)
+        return results[0] if results else None
+
+    async def sample(self, n: int) -> list[dict[str, Any]]:
         async with self.model_cls.database as conn:
-            result = await conn.execute(
-                self.options.as_select_option(select(*self.querys)).order_by(
-                    func.random(),
-                ),
-            )
-            if result_one := result.fetchone():
-                return result_one._asdict()
-            return None
+            rows = await self._sample_rows(conn, n)
+            return self._map_rows(rows)
 
     async def paginate(self, page: int, page_size: int) -> list[dict[str, Any]]:
         if page < 1 or page_size < 1:
@@ -678,6 +1238,58 @@ class ValueDictQuerySet(QuerySetProtocol):
         self.options.funcs.append(("offset", False, (page - 1) * page_size))
         return await self.all()
 
+    async def paginate_with_total(
+        self,
+        page: int,
+        page_size: int,
+    ) -> tuple[list[dict[str, Any]], int]:
+        async with self.model_cls.database as conn:
+            rows, total = await fetch_page_with_total(
+                conn,
+                self.options,
+                self._build_select(),
+                page,
+                page_size,
+            )
+            keys = rows[0]._fields[:-1] if rows else ()
+            return self._map_rows(rows, keys), total
+
+    async def explain(self, analyze: bool = False) -> QueryPlan:
+        async with self.model_cls.database as conn:
+            return await explain_select(conn, self._build_select(), analyze)
+
+    def __clause_element__(self) -> Select:
+        return self.options.as_subquery_option(
+            select(*self.querys),  # type: ignore
+        )
+
+    def _build_select(self, limit: Optional[int] = None) -> Select:
+        return self.options.as_select_option(
+            select(*self.querys),  # type: ignore
+            limit=limit,
+        )
+
+    def _map_rows(
+        self,
+        rows: Sequence[Row],
+        keys: Optional[Iterable[str]] = None,
+    ) -> list[dict[str, Any]]:
+        if not rows:
+            return []
+        return self.model_cls.__meta__.row_mapper.map_rows(
+            rows[0]._fields if keys is None else keys,
+            rows,
+        )
+
+    async def _sample_rows(self, conn: AsyncConnection, n: int) -> list[Row]:
+        return await sample_rows(
+            conn,
+            self.model_cls.table,
+            self.options,
+            self._build_select(),
+            n,
+        )
+
 
 class CoalesceQuerySet(QuerySetProtocol, Generic[Unpack[Ts]]):
     def __init__(
@@ -692,52 +1304,36 @@ class CoalesceQuerySet(QuerySetProtocol, Generic[Unpack[Ts]]):
 
     async def first(self) -> Union[Unpack[Ts], None]:
         async with self.model_cls.database as conn:
-            result = await conn.execute(
-                self.options.as_select_option(
-                    select(func.coalesce(*self.columns)).select_from(
-                        self.model_cls.table,
-                    ),
-                ),
-            )
+            result = await conn.execute(self._build_select(limit=1))
             if result_one := result.fetchone():
                 return result_one[0]
             return None
 
     async def get(self) -> Union[Unpack[Ts], None]:
-        results = await self.all()
+        async with self.model_cls.database as conn:
+            result = await conn.execute(self._build_select(limit=2))
+            results = result.fetchall()
         if len(results) > 1:
             raise MultipleDataError(
-                f"{self.model_cls} expect one data, but got {len(results)} datas",
+                f"{self.model_cls} expect one data, but got multiple datas",
             )
         if len(results) == 1:
-            return results[0]
+            return results[0][0]
         raise NoMatchDataError(f"No match data for {self.model_cls}")
 
     async def all(self) -> list[Union[Unpack[Ts], None]]:
         async with self.model_cls.database as conn:
-            result = await conn.execute(
-                self.options.as_select_option(
-                    select(func.coalesce(*self.columns)).select_from(
-                        self.model_cls.table,
-                    ),
-                ),
-            )
+            result = await conn.execute(self._build_select())
             return [result_one[0] for result_one in result.fetchall()]
 
     async def random_one(self) -> Union[Unpack[Ts], None]:
+        results = await self.sample(1)
+        return results[0] if results else None
+
+    async def sample(self, n: int) -> list[Union[Unpack[Ts], None]]:
         async with self.model_cls.database as conn:
-            result = await conn.execute(
-                self.options.as_select_option(
-                    select(func.coalesce(*self.columns)).select_from(
-                        self.model_cls.table,
-                    ),
-                ).order_by(
-                    func.random(),
-                ),
-            )
-            if result_one := result.fetchone():
-                return result_one[0]
-            return None
+            rows = await self._sample_rows(conn, n)
+            return [row[0] for row in rows]
 
     async def paginate(
         self,
@@ -751,3 +1347,138 @@ class CoalesceQuerySet(QuerySetProtocol, Generic[Unpack[Ts]]):
         # self.options.offset = (page - 1) * page_size
         self.options.funcs.append(("offset", False, (page - 1) * page_size))
         return await self.all()
+
+    async def paginate_with_total(
+        self,
+        page: int,
+        page_size: int,
+    ) -> tuple[list[Union[Unpack[Ts], None]], int]:
+        async with self.model_cls.database as conn:
+            rows, total = await fetch_page_with_total(
+                conn,
+                self.options,
+                self._build_select(),
+                page,
+                page_size,
+            )
+            return [row[0] for row in rows], total
+
+    async def explain(self, analyze: bool = False) -> QueryPlan:
+        async with self.model_cls.database as conn:
+            return await explain_select(conn, self._build_select(), analyze)
+
+    def __clause_element__(self) -> Select:
+        return self.options.as_subquery_option(
+            select(func.coalesce(*self.columns)).select_from(self.model_cls.table),
+        )
+
+    def _build_select(self, limit: Optional[int] = None) -> Select:
+        return self.options.as_select_option(
+            select(func.coalesce(*self.columns)).select_from(self.model_cls.table),
+            limit=limit,
+        )
+
+    async def _sample_rows(self, conn: AsyncConnection, n: int) -> list[Row]:
+        return await sample_rows(
+            conn,
+            self.model_cls.table,
+            self.options,
+            self._build_select(),
+            n,
+        )
+
+
+class RecordQuerySet(QuerySetProtocol):
+    def __init__(
+        self,
+        model_cls: type[T_MODEL],
+        options: QueryOptions,
+        columns: list[Column],
+    ) -> None:
+        self.model_cls = model_cls
+        self.options = options
+        self.columns = columns
+
+    async def first(self) -> Optional[Record]:
+        async with self.model_cls.database as conn:
+            result = await conn.execute(self._build_select(limit=1))
+            if result_one := result.fetchone():
+                return self._get_maker(result.keys())(result_one)
+            return None
+
+    async def get(self) -> Record:
+        async with self.model_cls.database as conn:
+            result = await conn.execute(self._build_select(limit=2))
+            results = result.fetchall()
+        if len(results) > 1:
+            raise MultipleDataError(
+                f"{self.model_cls} expect one data, but got multiple datas",
+            )
+        if len(results) == 1:
+            return self._get_maker(result.keys())(results[0])
+        raise NoMatchDataError(f"No match data for {self.model_cls}")
+
+    async def all(self) -> list[Record]:
+        async with self.model_cls.database as conn:
+            result = await conn.execute(self._build_select())
+            make = self._get_maker(result.keys())
+            return [make(result_one) for result_one in result.fetchall()]
+
+    async def random_one(self) -> Optional[Record]:
+        results = await self.sample(1)
+        return results[0] if results else None
+
+    async def sample(self, n: int) -> list[Record]:
+        async with self.model_cls.database as conn:
+            rows = await self._sample_rows(conn, n)
+            make = self._get_maker(column.name for column in self.columns)
+            return [make(row) for row in rows]
+
+    async def paginate(self, page: int, page_size: int) -> list[Record]:
+        if page < 1 or page_size < 1:
+            raise PaginateArgError("page and page_size must be positive")
+        # self.options.limit = page_size
+        self.options.funcs.append(("limit", False, page_size))
+        # self.options.offset = (page - 1) * page_size
+        self.options.funcs.append(("offset", False, (page - 1) * page_size))
+        return await self.all()
+
+    async def paginate_with_total(
+        self,
+        page: int,
+        page_size: int,
+    ) -> tuple[list[Record], int]:
+        async with self.model_cls.database as conn:
+            rows, total = await fetch_page_with_total(
+                conn,
+                self.options,
+                self._build_select(),
+                page,
+                page_size,
+            )
+            make = self._get_maker(column.name for column in self.columns)
+            return [make(row[:-1]) for row in rows], total
+
+    async def explain(self, analyze: bool = False) -> QueryPlan:
+        async with self.model_cls.database as conn:
+            return await explain_select(conn, self._build_select(), analyze)
+
+    def __clause_element__(self) -> Select:
+        return self.options.as_subquery_option(
+            select(*self.model_cls.get_pk_columns()),
+        )
+
+    def _build_select(self, limit: Optional[int] = None) -> Select:
+        return self.options.as_select_option(select(*self.columns), limit=limit)
+
+    def _get_maker(self, names: Iterable[str]) -> Callable[[Row], Record]:
+        return get_record_maker(get_record_class(self.model_cls), tuple(names))
+
+    async def _sample_rows(self, conn: AsyncConnection, n: int) -> list[Row]:
+        return await sample_rows(
+            conn,
+            self.model_cls.table,
+            self.options,
+            self._build_select(),
+            n,
+        )
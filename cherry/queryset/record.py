@@ -0,0 +1,72 @@
+from collections.abc import Sequence
+from functools import cache
+from keyword import iskeyword
+from typing import Any, Callable, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from cherry.models import Model
+
+
+class Record:
+    """a row of a model built without validation,
+    attributes are named after the columns of the model"""
+
+    __slots__ = ()
+
+    def _asdict(self) -> dict[str, Any]:
+        return {
+            name: getattr(self, name) for name in self.__slots__ if hasattr(self, name)
+        }
+
+    def __eq__(self, other: object) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+        return self._asdict() == other._asdict()  # type: ignore
+
+    __hash__ = None  # type: ignore
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{k}={v!r}" for k, v in self._asdict().items())
+        return f"{type(self).__name__}({fields})"
+
+
+@cache
+def get_record_class(model_cls: type["Model"]) -> type[Record]:
+    """create the record class of model_cls with a slot for every column"""
+    names = tuple(column.name for column in model_cls.__meta__.columns.values())
+    return type(
+        f"{model_cls.__name__}Record",
+        (Record,),
+        {"__slots__": names, "__module__": model_cls.__module__},
+    )
+
+
+@cache
+def get_record_maker(
+    record_cls: type[Record],
+    names: tuple[str, ...],
+) -> Callable[[Sequence[Any]], Record]:
+    """create a function building a record from rows of the given columns,
+    the columns missing from names are left unset"""
+    new = object.__new__
+    if not all(name.isidentifier() and not iskeyword(name) for name in names):
+
+        def make_by_setattr(row: Sequence[Any]) -> Record:
+            record = new(record_cls)
+            for name, value in zip(names, row):
+                setattr(record, name, value)
+            return record
+
+        return make_by_setattr
+    # generated like the __init__ of dataclasses, a single unpacking
+    # assignment stores all slots without a setattr call per column
+    targets = "".join(f"record.{name}, " for name in names)
+    source = (
+        "def make(row):\n"
+        "    record = new(record_cls)\n"
+        f"    [{targets}] = row\n"
+        "    return record\n"
+    )
+    namespace: dict[str, Any] = {"new": new, "record_cls": record_cls}
+    exec(source, namespace)  # noqa: S102
+    return namespace["make"]
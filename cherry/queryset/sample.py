@@ -0,0 +1,156 @@
+from dataclasses import replace
+import random
+from typing import Any, Optional, TYPE_CHECKING
+
+from .count import get_pg_reltuples
+
+from sqlalchemy import func, Integer, Row, Select, select, Table, tablesample
+from sqlalchemy.ext.asyncio import AsyncConnection
+from sqlalchemy.sql.util import ClauseAdapter
+
+if TYPE_CHECKING:
+    from .queryset import QueryOptions
+
+# extra rows requested per probe/sample round to absorb gaps and misses
+OVERSAMPLE_FACTOR = 2
+PROBE_ROUNDS = 3
+MIN_PROBE_SIZE = 16
+
+
+def _can_resample(options: "QueryOptions") -> bool:
+    # limit/offset/distinct/group_by change the row population, only the
+    # ordering may be thrown away when drawing a sample
+    return all(func_[0] == "order_by" for func_ in options.funcs)
+
+
+def _get_integer_pk(table: Table) -> Optional[Any]:
+    pk_columns = list(table.primary_key.columns)
+    if len(pk_columns) == 1 and isinstance(pk_columns[0].type, Integer):
+        return pk_columns[0]
+    return None
+
+
+async def _sample_by_pk_probe(
+    conn: AsyncConnection,
+    table: Table,
+    options: "QueryOptions",
+    select_stat: Select,
+    n: int,
+    rng: random.Random,
+) -> Optional[list[Row]]:
+    pk = _get_integer_pk(table)
+    if pk is None:
+        return None
+    bounds = await conn.execute(
+        replace(options, funcs=[]).as_select_option(
+            select(func.min(pk), func.max(pk)).select_from(table),
+        ),
+    )
+    low, high = bounds.one()
+    if low is None:
+        return []
+    span = high - low + 1
+    if span <= n * OVERSAMPLE_FACTOR:
+        # small enough to read entirely
+        return None
+    found: set[Any] = set()
+    for _ in range(PROBE_ROUNDS):
+        need = n - len(found)
+        size = min(span, max(need * OVERSAMPLE_FACTOR, MIN_PROBE_SIZE))
+        candidates = set(rng.sample(range(low, high + 1), size)) - found
+        result = await conn.execute(
+            replace(options, funcs=[]).as_select_option(
+                select(pk).where(pk.in_(candidates)),
+            ),
+        )
+        found.update(result.scalars().all())
+        if len(found) >= n:
+            break
+    else:
+        # the pk range is too sparse for this filter
+        return None
+    picked = rng.sample(sorted(found), n)
+    result = await conn.execute(select_stat.where(pk.in_(picked)))
+    rows = result.fetchall()
+    rng.shuffle(rows)
+    return rows
+
+
+async def _sample_by_tablesample(
+    conn: AsyncConnection,
+    table: Table,
+    select_stat: Select,
+    n: int,
+    rng: random.Random,
+) -> Optional[list[Row]]:
+    if conn.dialect.name != "postgresql":
+        return None
+    estimate = await get_pg_reltuples(conn, table)
+    if not estimate:
+        return None
+    percent = min(100.0, n * OVERSAMPLE_FACTOR * 100.0 / estimate)
+    sampled = tablesample(table, func.bernoulli(percent))
+    result = await conn.execute(ClauseAdapter(sampled).traverse(select_stat))
+    rows = result.fetchall()
+    if len(rows) < n:
+        return None
+    return rng.sample(rows, n)
+
+
+async def _sample_by_random_order(
+    conn: AsyncConnection,
+    select_stat: Select,
+    n: int,
+) -> list[Row]:
+    # databases keep a top-n heap for ORDER BY ... LIMIT, so this is still a
+    # single pass without sorting the whole result
+    result = await conn.execute(select_stat.order_by(func.random()).limit(n))
+    return list(result.fetchall())
+
+
+async def _sample_by_reservoir(
+    conn: AsyncConnection,
+    select_stat: Select,
+    n: int,
+    rng: random.Random,
+) -> list[Row]:
+    reservoir: list[Row] = []
+    result = await conn.stream(select_stat)
+    seen = 0
+    async for row in result:
+        seen += 1
+        if len(reservoir) < n:
+            reservoir.append(row)
+        elif (index := rng.randrange(seen)) < n:
+            reservoir[index] = row
+    rng.shuffle(reservoir)
+    return reservoir
+
+
+async def sample_rows(
+    conn: AsyncConnection,
+    table: Table,
+    options: "QueryOptions",
+    select_stat: Select,
+    n: int,
+    rng: Optional[random.Random] = None,
+) -> list[Row]:
+    """draw up to n distinct random rows of select_stat without ORDER BY random()
+
+    tries primary key range probing for integer primary keys first, then
+    TABLESAMPLE on PostgreSQL, then a bounded ORDER BY random(). querysets
+    with limit/offset/distinct/group_by use reservoir sampling over a stream
+    """
+    if n < 1:
+        return []
+    rng = rng or random.Random()
+    if _can_resample(options):
+        select_stat = select_stat.order_by(None)
+        rows = await _sample_by_pk_probe(conn, table, options, select_stat, n, rng)
+        if rows is not None:
+            return rows
+        rows = await _sample_by_tablesample(conn, table, select_stat, n, rng)
+        if rows is not None:
+            return rows
+        return await _sample_by_random_order(conn, select_stat, n)
+    return await _sample_by_reservoir(conn, select_stat, n, rng)
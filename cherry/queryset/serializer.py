@@ -0,0 +1,69 @@
+from functools import cache
+from typing import Any, Callable, Optional, TYPE_CHECKING
+
+from pydantic import BaseModel
+from pydantic_core import to_json
+
+if TYPE_CHECKING:
+    from cherry.models import Model
+
+RowSerializer = Callable[[Optional[dict[str, Any]]], Any]
+
+
+@cache
+def get_row_serializer(model_cls: type["Model"]) -> RowSerializer:
+    """create a function shaping a database result dict of model_cls,
+    with its fetched relations, like `model_dump()` without building the model
+
+    columns missing from the dict (e.g. not selected by `only`) are left out
+    and relations which were not fetched get their default
+    """
+    meta = model_cls.__meta__
+    columns: list[tuple[str, str]] = []
+    relations: list[tuple[str, Callable[[], Any], bool]] = []
+    for name, field in model_cls.model_fields.items():
+        if name in meta.related_fields:
+            relations.append((name, field.get_default, False))
+        elif name in meta.reverse_related_fields:
+            is_list = meta.reverse_related_fields[name].is_list
+            relations.append((name, field.get_default, is_list))
+        elif name in meta.many_to_many_fields:
+            relations.append((name, field.get_default, True))
+        elif name in meta.columns:
+            columns.append((name, meta.columns[name].name))
+    related_models = {
+        name: field.related_model
+        for fields in (
+            meta.related_fields,
+            meta.reverse_related_fields,
+            meta.many_to_many_fields,
+        )
+        for name, field in fields.items()
+    }
+
+    def serialize(data: Optional[dict[str, Any]]) -> Any:
+        if data is None or isinstance(data, BaseModel):
+            return data
+        result = {name: data[key] for name, key in columns if key in data}
+        for name, get_default, is_list in relations:
+            if name not in data:
+                result[name] = get_default(call_default_factory=True)
+                continue
+            # resolved lazily, the related model may be defined later
+            related_serializer = get_row_serializer(related_models[name])
+            value = data[name]
+            result[name] = (
+                [related_serializer(v) for v in value]
+                if is_list
+                else related_serializer(value)
+            )
+        return result
+
+    return serialize
+
+
+def dump_json(model_cls: type["Model"], value: Any) -> bytes:
+    return to_json(
+        value,
+        bytes_mode=model_cls.model_config.get("ser_json_bytes", "utf8"),
+    )
@@ -38,6 +38,9 @@ async def main():
     user3.birthday = date(2024, 6, 1)
     await User.save_many(user1, user2, user3)
 
+    await User.filter(User.name == "user 1 updated").update(age=User.age + 1)
+    await user2.update(age=User.age + 1)
+
 
 if __name__ == "__main__":
     import asyncio
@@ -1,9 +1,12 @@
 from __future__ import annotations
 
+from datetime import date
+
 import cherry
 from tests.database import database
 
 from pydantic import BaseModel
+from sqlalchemy import text
 
 
 class User(cherry.Model):
@@ -50,6 +53,25 @@ class Post(cherry.Model):
     cherry_config = {"database": database}
 
 
+class Membership(cherry.Model):
+    user_id: cherry.PrimaryKey[int]
+    group: cherry.PrimaryKey[str]
+    role: str = "member"
+
+    cherry_config = {"database": database}
+
+
+class Counter(cherry.Model):
+    id: cherry.AutoIntPK = None
+    name: str
+    hits: int | None = cherry.Field(
+        default=None,
+        sa_column_extra={"server_default": text("0")},
+    )
+
+    cherry_config = {"database": database}
+
+
 class Data(BaseModel):
     a: str
     b: str
@@ -62,3 +84,21 @@ class JsonModel(cherry.Model):
     dic: dict[str, dict[str, str]]
 
     cherry_config = {"database": database}
+
+
+class Event(cherry.Model):
+    id: cherry.AutoIntPK = None
+    name: str
+    day: date
+
+    cherry_config = {"database": database}
+
+
+class Task(cherry.Model):
+    id: cherry.AutoIntPK = None
+    name: str
+    progress: int = 0
+    # RETURNING is a keyword which sqlalchemy does not quote on sqlite
+    returning: bool = cherry.Field(default=False, sa_column_extra={"quote": True})
+
+    cherry_config = {"database": database}
@@ -0,0 +1,53 @@
+from tests.models import Membership, User
+
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_delete_many():
+    users = [
+        User(id=i, name=f"user {i}", introduce="", age=i * 5, money=i * 100.0)
+        for i in range(1, 11)
+    ]
+    await User.insert_many(*users)
+
+    assert await User.delete_many(*users[:7], batch_size=3) == 7
+    ids = await User.select().order_by(User.id).values(User.id, flatten=True).all()
+    assert ids == [8, 9, 10]
+    assert await User.delete_many(*users) == 3
+
+    memberships = [
+        Membership(user_id=i, group=group) for i in range(1, 4) for group in ("a", "b")
+    ]
+    await Membership.insert_many(*memberships)
+    assert await Membership.delete_many(*memberships[::2]) == 3
+    assert await Membership.filter(group="a").count() == 0
+    assert await Membership.filter(group="b").count() == 3
+
+
+@pytest.mark.asyncio
+async def test_queryset_delete_in_batches():
+    users = [
+        User(id=i, name=f"user {i}", introduce="", age=i, money=i * 100.0)
+        for i in range(1, 21)
+    ]
+    await User.insert_many(*users)
+
+    progress = []
+    deleted = await User.filter(User.age > 5).delete(
+        batch_size=4,
+        pause=0.001,
+        progress=progress.append,
+    )
+    assert deleted == 15
+    assert progress == [4, 8, 12, 15]
+    assert await User.select().count() == 5
+
+    memberships = [
+        Membership(user_id=i, group=group)
+        for i in range(1, 6)
+        for group in ("a", "b", "c")
+    ]
+    await Membership.insert_many(*memberships)
+    assert await Membership.filter(Membership.group != "c").delete(batch_size=3) == 10
+    assert await Membership.select().count() == 5
@@ -1,5 +1,5 @@
 import cherry.exception
-from tests.models import Post, School, Student, Tag, User
+from tests.models import Counter, Post, School, Student, Tag, User
 
 import pytest
 
@@ -85,3 +85,25 @@ async def test_many_to_many():
     with pytest.raises(cherry.exception.FieldTypeError):
         await post1.add(user)
         await tag1.add(user)
+
+
+@pytest.mark.asyncio
+async def test_insert_returning():
+    counter = await Counter(name="counter 1").insert()
+    assert counter.id == 1 and counter.hits is None
+    # without returning an explicit None is stored as NULL
+    assert (await Counter.get(id=1)).hits is None
+
+    counter = await Counter(name="counter 2").insert(returning=True)
+    assert counter.id == 2 and counter.hits == 0
+
+    dialect = Counter.database.engine.dialect
+    dialect.insert_returning = False
+    try:
+        counter = await Counter(name="counter 3").insert(returning=True)
+    finally:
+        dialect.insert_returning = True
+    assert counter.id == 3 and counter.hits == 0
+
+    await counter.update(returning=True, name="counter 3 updated")
+    assert counter == await Counter.get(id=3)
@@ -1,3 +1,7 @@
+from typing import Optional
+
+import cherry
+from cherry.database import Database
 from cherry.fields.fields import (
     BaseField,
     ForeignKeyField,
@@ -75,6 +79,12 @@ async def test_one_to_many():
         (sa_types.NullType, sa_types.Integer),
     )
     assert Student.__meta__.columns["school"].name == "School_id"
+    assert Student.__meta__.columns["school"].index
+    row_mapper = Student.__meta__.row_mapper
+    assert row_mapper.keys == ("id", "name", "School_id")
+    assert row_mapper.map_row((1, "a", 2)) == {"id": 1, "name": "a", "School_id": 2}
+    assert row_mapper.get(("name", "id"))(("a", 1)) == {"name": "a", "id": 1}
+    assert row_mapper.get(row_mapper.keys) is row_mapper.map_row
     assert isinstance(Student.model_fields["school"], ForeignKeyField)
     assert Student.__meta__.related_fields == {
         "school": Student.model_fields["school"],
@@ -118,3 +128,30 @@ async def test_many_to_many():
 
     assert tag_field.table is post_field.table
     assert tag_field.table.name == "Post_Tag"
+    assert all(column.index for column in tag_field.table.columns)
+
+
+@pytest.mark.asyncio
+async def test_foreign_key_index_opt_out():
+    other_database = Database("sqlite+aiosqlite:///:memory:")
+
+    class Owner(cherry.Model):
+        id: cherry.AutoIntPK = None
+
+        cherry_config = {"database": other_database}
+
+    class Pet(cherry.Model):
+        id: cherry.AutoIntPK = None
+        owner: Optional[Owner] = cherry.Relationship(
+            default=None,
+            foreign_key=True,
+            sa_column_extra={"index": False},
+        )
+
+        cherry_config = {"database": other_database}
+
+    other_database.init_all_model()
+    # foreign keys are indexed by default, sa_column_extra turns it off
+    assert not Pet.__meta__.columns["owner"].index
+    assert not Pet.table.indexes
+    assert Student.table.indexes
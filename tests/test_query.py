@@ -1,7 +1,33 @@
+import asyncio
+from datetime import date
+import json
+import random
+from types import SimpleNamespace
+
 import cherry.exception
-from tests.models import Data, JsonModel, School, Student, User
+import cherry.models.models
+from cherry.queryset import (
+    count as count_module,
+    QuerySet,
+    sample as sample_module,
+)
+from cherry.queryset.explain import compile_explain
+from tests.models import (
+    Data,
+    Event,
+    JsonModel,
+    Membership,
+    Post,
+    School,
+    Student,
+    Tag,
+    User,
+)
 
+from pydantic import ValidationError
 import pytest
+from sqlalchemy import event, func
+from sqlalchemy.dialects import postgresql
 
 
 @pytest.mark.asyncio
@@ -84,6 +110,395 @@ async def test_query_with_one_to_many():
     assert len(schools[1].students) == 1
 
 
+@pytest.mark.asyncio
+async def test_query_through_relations():
+    school1 = await School(name="school 1").insert()
+    school2 = await School(name="school 2").insert()
+    for i in range(1, 6):
+        school = school2 if i > 3 else school1
+        await Student(name=f"student {i}", school=school).insert()
+
+    students = await Student.filter(school__name="school 1").all()
+    assert [student.id for student in students] == [1, 2, 3]
+    await Student(name="student 6").insert()
+    students = await Student.filter(
+        (Student.name == "student 6")
+        | ((Student.school.name == "school 1") & (Student.name != "student 1")),
+    ).all()
+    assert {student.id for student in students} == {2, 3, 6}
+    assert await Student.filter(Student.school.name == "school 2").count() == 2
+    assert await Student.filter(Student.school.name == "school 3").exists() is False
+    names = (
+        await Student.filter(school__name="school 2")
+        .values(
+            Student.name,
+            flatten=True,
+        )
+        .all()
+    )
+    assert names == ["student 4", "student 5"]
+
+    # to-many relations filter without repeating rows
+    schools = await School.filter(School.students.name != "student 1").all()
+    assert [school.id for school in schools] == [1, 2]
+    assert await School.filter(School.students.name == "student 5").count() == 1
+
+    tag1 = await Tag(name="tag 1").insert()
+    tag2 = await Tag(name="tag 2").insert()
+    post1 = await Post(title="post 1").insert()
+    post2 = await Post(title="post 2").insert()
+    await post1.add(tag1)
+    await post1.add(tag2)
+    await post2.add(tag2)
+    posts = await Post.filter(Post.tags.name.in_(["tag 1", "tag 2"])).all()
+    assert [post.id for post in posts] == [1, 2]
+    assert await Post.filter(Post.tags.name == "tag 1").values(
+        Post.title,
+        flatten=True,
+    ).all() == ["post 1"]
+
+    assert (
+        await Student.filter(Student.school.name == "school 2").update(
+            name="moved",
+        )
+        == 2
+    )
+    assert await Student.filter(school__name="school 1").delete() == 3
+    assert await Student.filter(name="moved").count() == 2
+
+
+@pytest.mark.asyncio
+async def test_relation_exists_filter():
+    school1 = await School(name="school 1").insert()
+    school2 = await School(name="school 2").insert()
+    await School(name="school 3").insert()
+    await Student(name="student 1", school=school1).insert()
+    await Student(name="student 2", school=school2).insert()
+    await Student(name="student 3", school=school2).insert()
+    await Student(name="student 4").insert()
+
+    schools = await School.filter(School.students.any(name="student 2")).all()
+    assert [school.id for school in schools] == [2]
+    schools = await School.filter(School.students.any()).all()
+    assert [school.id for school in schools] == [1, 2]
+    schools = await School.filter(School.students.none()).all()
+    assert [school.id for school in schools] == [3]
+    assert await School.filter(School.students.none(name="student 1")).count() == 2
+
+    students = await Student.filter(Student.school.any(name="school 2")).all()
+    assert [student.id for student in students] == [2, 3]
+    assert await Student.filter(Student.school.none()).count() == 1
+
+    tag1 = await Tag(name="tag 1").insert()
+    tag2 = await Tag(name="tag 2").insert()
+    post1 = await Post(title="post 1").insert()
+    post2 = await Post(title="post 2").insert()
+    await Post(title="post 3").insert()
+    await post1.add(tag1)
+    await post2.add(tag1)
+    await post2.add(tag2)
+    posts = await Post.filter(Post.tags.any(Tag.name == "tag 2")).all()
+    assert [post.id for post in posts] == [2]
+    posts = await Post.filter(Post.tags.none(Tag.name == "tag 2")).all()
+    assert [post.id for post in posts] == [1, 3]
+    tags = await Tag.filter(Tag.posts.any(title="post 1")).all()
+    assert [tag.name for tag in tags] == ["tag 1"]
+
+
+@pytest.mark.asyncio
+async def test_queryset_as_subquery():
+    school1 = await School(name="school 1").insert()
+    school2 = await School(name="school 2").insert()
+    await Student(name="student 1", school=school1).insert()
+    await Student(name="student 2", school=school2).insert()
+    await Student(name="student 3", school=school2).insert()
+
+    schools = School.filter(School.name == "school 2")
+    students = await Student.filter(Student.School_id.in_(schools)).all()
+    assert [student.id for student in students] == [2, 3]
+    students = await Student.filter(
+        Student.School_id.in_(schools.values(School.id, flatten=True)),
+    ).all()
+    assert [student.id for student in students] == [2, 3]
+    assert await Student.filter(School_id__not_in=schools).count() == 1
+
+    # the subquery is not correlated to the outer query of the same table
+    latest = Student.select().order_by(Student.id.desc()).limit(2)
+    names = (
+        await Student.filter(Student.id.in_(latest))
+        .values(
+            Student.name,
+            flatten=True,
+        )
+        .all()
+    )
+    assert names == ["student 2", "student 3"]
+    others = Student.filter(Student.name != "student 1").values(Student.id)
+    assert await Student.filter(Student.id.in_(others)).count() == 2
+
+
+@pytest.mark.asyncio
+async def test_prefetch_slice():
+    school1 = await School(name="school 1").insert()
+    school2 = await School(name="school 2").insert()
+    await School(name="school 3").insert()
+    for i in range(1, 11):
+        school = school1 if i % 2 else school2
+        await Student(name=f"student {i}", school=school).insert()
+
+    schools = await School.select_related(
+        cherry.Prefetch(School.students, order_by=Student.id.desc(), limit=2),
+    ).all()
+    assert [[s.id for s in school.students] for school in schools] == [
+        [9, 7],
+        [10, 8],
+        [],
+    ]
+    school = (
+        await School.filter(name="school 1")
+        .prefetch_related(
+            cherry.Prefetch(
+                School.students,
+                where=Student.name != "student 9",
+                order_by=[Student.name],
+                limit=3,
+            ),
+        )
+        .get()
+    )
+    assert [s.name for s in school.students] == ["student 1", "student 3", "student 5"]
+    schools = await School.select_related(
+        cherry.Prefetch(School.students, where=Student.id > 8),
+    ).all()
+    assert [len(school.students) for school in schools] == [1, 1, 0]
+
+    tags = [await Tag(name=f"tag {i}").insert() for i in range(1, 5)]
+    post1 = await Post(title="post 1").insert()
+    post2 = await Post(title="post 2").insert()
+    for tag in tags:
+        await post1.add(tag)
+    await post2.add(tags[0])
+    posts = await Post.select_related().all()
+    assert [[t.name for t in post.tags] for post in posts] == [
+        ["tag 1", "tag 2", "tag 3", "tag 4"],
+        ["tag 1"],
+    ]
+    posts = await Post.select_related(
+        cherry.Prefetch(Post.tags, order_by=Tag.name.desc(), limit=2),
+    ).all()
+    assert [[t.name for t in post.tags] for post in posts] == [
+        ["tag 4", "tag 3"],
+        ["tag 1"],
+    ]
+
+    with pytest.raises(cherry.exception.FieldTypeError):
+        cherry.Prefetch(Student.school, limit=1)
+    with pytest.raises(cherry.exception.FieldTypeError):
+        Student.select_related(cherry.Prefetch(School.students, limit=1))
+
+
+@pytest.mark.asyncio
+async def test_prefetch_queryset_and_only():
+    school1 = await School(name="school 1").insert()
+    school2 = await School(name="school 2").insert()
+    for i in range(1, 7):
+        school = school1 if i % 2 else school2
+        await Student(name=f"student {i}", school=school).insert()
+
+    users = [User(id=i, name=f"user {i}", introduce="hi", age=i) for i in range(1, 4)]
+    await User.insert_many(*users)
+    partial = await User.filter(User.age > 1).only(User.name, "age").all()
+    assert [(u.id, u.name, u.age) for u in partial] == [
+        (2, "user 2", 2),
+        (3, "user 3", 3),
+    ]
+    assert partial[0].model_fields_set == {"id", "name", "age"}
+    assert "introduce" not in partial[0].__dict__
+    assert (await User.filter(id=1).only(User.age).get()).age == 1
+    assert [u.name for u in await User.only("name").all()] == [u.name for u in users]
+
+    schools = await School.select_related(
+        cherry.Prefetch(
+            School.students,
+            queryset=Student.filter(Student.name != "student 1")
+            .order_by(Student.id.desc())
+            .limit(2)
+            .only(Student.name),
+        ),
+    ).all()
+    assert [[(s.id, s.name) for s in school.students] for school in schools] == [
+        [(5, "student 5"), (3, "student 3")],
+        [(6, "student 6"), (4, "student 4")],
+    ]
+    assert schools[0].students[0].model_fields_set == {"id", "name"}
+
+    # the related queryset may prefetch its own relations
+    schools = (
+        await School.filter(name="school 2")
+        .prefetch_related(
+            cherry.Prefetch(
+                School.students,
+                queryset=Student.filter(Student.id < 5).prefetch_related(
+                    Student.school,
+                ),
+            ),
+        )
+        .all()
+    )
+    students = schools[0].students
+    assert [s.id for s in students] == [2, 4]
+    assert all(s.school.name == "school 2" for s in students)
+
+    with pytest.raises(cherry.exception.FieldTypeError):
+        cherry.Prefetch(School.students, queryset=User.select())
+    with pytest.raises(ValueError):
+        cherry.Prefetch(School.students, queryset=Student.select().offset(1))
+
+
+@pytest.mark.asyncio
+async def test_update_partial_model():
+    await User(id=1, name="user 1", introduce="hi", age=40, money=999).insert()
+    user = await User.filter(id=1).only(User.name).get()
+    assert user.model_fields_set == {"id", "name"}
+    assert "age" not in user.__dict__
+    assert "money" not in user.__dict__
+    await user.update(name="renamed")
+    await user.save()
+    assert user.model_fields_set == {"id", "name"}
+    full = await User.get(id=1)
+    assert (full.name, full.introduce, full.age, full.money) == (
+        "renamed",
+        "hi",
+        40,
+        999,
+    )
+
+    school = await School(name="school").insert()
+    await Student(name="student", school=school).insert()
+    student = (await Student.only(Student.name).all())[0]
+    # an unselected relation keeps its default instead of the class proxy
+    assert student.school is None
+    assert (await Student.filter(id=student.id).only(Student.name).get()).school is None
+    await student.update(name="renamed")
+    # the foreign key which was not selected is left as it is
+    student = await Student.select_related(Student.school).filter(id=student.id).get()
+    assert student.name == "renamed"
+    assert student.school == school
+
+
+@pytest.mark.asyncio
+async def test_paginate_with_total():
+    await User.insert_many(
+        *(User(id=i, name=f"user {i}", introduce="", age=i % 3) for i in range(1, 8)),
+    )
+
+    users, total = await User.select().order_by(User.id).paginate_with_total(2, 3)
+    assert [user.id for user in users] == [4, 5, 6] and total == 7
+    users, total = await User.filter(User.age > 0).paginate_with_total(1, 10)
+    assert len(users) == 5 and total == 5
+    assert await User.filter(User.age > 5).paginate_with_total(1, 10) == ([], 0)
+    # an empty page still reports the total
+    assert await User.paginate_with_total(4, 3) == ([], 7)
+
+    ordered = User.select().order_by(User.id)
+    ids = ordered.values(User.id, flatten=True)
+    assert await ids.paginate_with_total(3, 3) == ([7], 7)
+    rows = ordered.values(User.id, User.name)
+    assert await rows.paginate_with_total(1, 2) == ([(1, "user 1"), (2, "user 2")], 7)
+    assert await ordered.value_dict(User.id).paginate_with_total(1, 1) == (
+        [{"id": 1}],
+        7,
+    )
+    names = ordered.coalesce(User.name, User.introduce)
+    names, total = await names.paginate_with_total(1, 2)
+    assert names == ["user 1", "user 2"] and total == 7
+
+    # DISTINCT and GROUP BY are counted after deduplication
+    ages = User.select().order_by(User.age).distinct().values(User.age, flatten=True)
+    assert await ages.paginate_with_total(1, 2) == ([0, 1], 3)
+    ages = User.select().group_by(User.age).order_by(User.age)
+    assert await ages.values(User.age, flatten=True).paginate_with_total(2, 2) == (
+        [2],
+        3,
+    )
+
+    with pytest.raises(cherry.exception.PaginateArgError):
+        await User.paginate_with_total(0, 10)
+
+
+@pytest.mark.asyncio
+async def test_approximate_count():
+    await User.insert_many(
+        *(User(id=i, name=f"user {i}", introduce="", age=i % 5) for i in range(1, 51)),
+    )
+
+    # without statistics the rows are counted
+    result = await User.select().count(approximate=True)
+    assert result == cherry.CountResult(50, "exact") and result.is_exact
+
+    async with User.database as conn:
+        await conn.exec_driver_sql("ANALYZE")
+    result = await User.select().count(approximate=True)
+    assert result == cherry.CountResult(50, "table_statistics")
+    assert not result.is_exact and int(result) == 50
+    result = await User.filter(name="user 3").count(approximate=True)
+    assert result == cherry.CountResult(1, "table_statistics")
+    # filters not covered by statistics fall back to exact counting
+    result = await User.filter(User.age > 2).count(approximate=True)
+    assert result == cherry.CountResult(20, "exact")
+    result = await User.filter(age=1).count(approximate=True)
+    assert result == cherry.CountResult(10, "exact")
+    assert await User.filter(User.age > 2).count() == 20
+
+    # the plan estimate of postgresql is an EXPLAIN of the typed select
+    sql = compile_explain(
+        "EXPLAIN (FORMAT JSON)",
+        JsonModel.filter(JsonModel.data.a == "123")._build_select(),
+        postgresql.asyncpg.dialect(),
+    )
+    assert sql.startswith("EXPLAIN (FORMAT JSON) SELECT")
+    # the json path ["a"] is rendered by asyncpg's literal processor
+    assert "#>> '{a}'" in sql and "'123'" in sql
+
+
+class RecordingConnection:
+    """stands in for a postgresql connection, records the statements"""
+
+    def __init__(self, scalar: object) -> None:
+        self.dialect = SimpleNamespace(name="postgresql")
+        self.statements: list[tuple[str, object]] = []
+        self._scalar = scalar
+
+    async def execute(self, stat, params=None):
+        self.statements.append((str(stat), params))
+        return SimpleNamespace(scalar=lambda: self._scalar)
+
+
+@pytest.mark.asyncio
+async def test_pg_relation_statistics():
+    # the capitalized default table names must not go through regclass,
+    # which folds them to lower case
+    conn = RecordingConnection(42.0)
+    assert await count_module.get_pg_reltuples(conn, User.table) == 42.0
+    assert await count_module._count_from_pg_class(conn, User.table) == 42
+    (sql, params), _ = conn.statements
+    assert "regclass" not in sql and "c.relname = :name" in sql
+    assert params == {"name": "User", "schema": None}
+
+    conn = RecordingConnection(-1.0)
+    assert await count_module.get_pg_reltuples(conn, User.table) is None
+    select_stat = User.select()._build_select()
+    rows = await sample_module._sample_by_tablesample(
+        conn,
+        User.table,
+        select_stat,
+        3,
+        random.Random(),
+    )
+    assert rows is None
+    assert conn.statements[-1][1] == {"name": "User", "schema": None}
+
+
 @pytest.mark.asyncio
 async def test_json_query():
     await JsonModel(
@@ -106,3 +521,447 @@ async def test_json_query():
         ).count()
         == 2
     )
+
+
+@pytest.mark.asyncio
+async def test_atomic_get_or_create(monkeypatch: pytest.MonkeyPatch):
+    results = await asyncio.gather(
+        *(
+            User.get_or_create(name="user 1", defaults={"introduce": "", "age": i})
+            for i in range(5)
+        ),
+    )
+    assert [is_get for _, is_get in results].count(False) == 1
+    assert len({user.id for user, _ in results}) == 1
+    assert await User.filter(name="user 1").count() == 1
+
+    statements = []
+
+    def count_statement(*args):
+        statements.append(args[2])
+
+    engine = User.database._engine.sync_engine
+    event.listen(engine, "before_cursor_execute", count_statement)
+    try:
+        # the defaults can not create a user, so it is updated in one statement
+        user, is_update = await User.update_or_create(
+            name="user 1",
+            defaults={"age": 30},
+        )
+        assert is_update and user.age == 30 and user.id == results[0][0].id
+        assert len(statements) == 1 and statements[0].startswith("UPDATE")
+        with pytest.raises(ValidationError):
+            await User.update_or_create(name="user 8", defaults={"age": 30})
+
+        # an insert, with a second statement for a conflict on sqlite
+        statements.clear()
+        user, is_update = await User.update_or_create(
+            name="user 2",
+            defaults={"introduce": "", "money": 1.0},
+        )
+        assert not is_update and user.id is not None and user.money == 1.0
+        assert len(statements) == 1
+        user, is_update = await User.update_or_create(
+            User.name == "user 2",
+            defaults={"introduce": "again", "money": 2.0},
+        )
+        assert is_update and (user.introduce, user.money) == ("again", 2.0)
+        user, is_get = await User.get_or_create(
+            name="user 2",
+            defaults={"introduce": "", "age": 1},
+        )
+        assert is_get and user.introduce == "again" and user.age == 18
+        assert statements[1].startswith("INSERT") and len(statements) == 5
+
+        # without a unique key in the filter it falls back to select and update
+        statements.clear()
+        user, is_update = await User.update_or_create(
+            User.age == 30,
+            defaults={"money": 3.0},
+        )
+        assert is_update and user.name == "user 1" and user.money == 3.0
+        assert statements[0].startswith("SELECT") and statements[1].startswith(
+            "UPDATE",
+        )
+    finally:
+        event.remove(engine, "before_cursor_execute", count_statement)
+
+    data, inserted = await User(name="user 1", introduce="")._upsert(["name"], [])
+    assert not inserted and data["age"] == 30
+    with monkeypatch.context() as m:
+        m.setattr(cherry.models.models, "get_upsert_insert", lambda dialect: None)
+        with pytest.raises(cherry.exception.DialectNotSupportedError):
+            await User(name="user 9", introduce="")._upsert(["name"], [])
+
+
+@pytest.mark.asyncio
+async def test_get_is_limit_bounded():
+    await User.insert_many(
+        *(User(id=i, name=f"user {i}", introduce="", age=i) for i in range(1, 6)),
+    )
+
+    assert User.select()._build_select(limit=2)._limit == 2
+    assert User.select().limit(1)._build_select(limit=2)._limit == 1
+    assert User.select().values(User.id)._build_select(limit=1)._limit == 1
+
+    with pytest.raises(cherry.exception.MultipleDataError):
+        await User.filter(User.age > 1).get()
+    with pytest.raises(cherry.exception.MultipleDataError):
+        await User.filter(User.age > 1).values(User.id).get()
+    with pytest.raises(cherry.exception.MultipleDataError):
+        await User.filter(User.age > 1).values(User.id, flatten=True).get()
+    assert (await User.filter(User.age > 1).order_by(User.id).limit(1).get()).id == 2
+    assert await User.filter(age=3).values(User.name, flatten=True).get() == "user 3"
+    assert await User.filter(age=3).values(User.id, User.name).get() == (3, "user 3")
+    assert (await User.select().order_by(User.id).first()).id == 1
+
+
+@pytest.mark.asyncio
+async def test_sample():
+    await User.insert_many(
+        *(User(id=i, name=f"user {i}", introduce="", age=i) for i in range(1, 101)),
+    )
+
+    users = await User.sample(10)
+    assert len(users) == 10 and len({user.id for user in users}) == 10
+    users = await User.filter(User.age > 90).order_by(User.id).sample(20)
+    assert sorted(user.id for user in users) == list(range(91, 101))
+    assert (await User.filter(User.age > 90).random_one()).age > 90
+    assert await User.filter(User.age > 1000).random_one() is None
+    assert await User.select().sample(0) == []
+
+    ids = await User.select().order_by(User.id).limit(5).values(User.id).sample(3)
+    assert len(ids) == 3 and all(id_ <= 5 for (id_,) in ids)
+    names = await User.filter(User.age < 3).values(User.name, flatten=True).sample(5)
+    assert sorted(names) == ["user 1", "user 2"]
+    assert len(await User.select().values(User.id, User.name).sample(4)) == 4
+    assert (
+        await User.select().coalesce(User.name, User.introduce).random_one()
+    ).startswith(
+        "user",
+    )
+
+    await Membership.insert_many(
+        *(Membership(user_id=i, group=str(i % 3)) for i in range(1, 31)),
+    )
+    memberships = await Membership.filter(group="1").sample(5)
+    assert len(memberships) == 5 and all(m.group == "1" for m in memberships)
+
+
+@pytest.mark.asyncio
+async def test_explain():
+    plan = await User.filter(name="user 1").explain()
+    assert plan.dialect == "sqlite" and plan.uses_index()
+    assert not plan.has_full_scan()
+    plan = await User.filter(User.age > 2).explain()
+    assert plan.has_full_scan(User.tablename) and not plan.uses_index()
+    assert (await User.filter(id=1).explain()).uses_index("PRIMARY KEY")
+
+    school = School(id=1, name="school 1")
+    plan = await Student.filter(Student.school == school).values(Student.name).explain()
+    assert plan.uses_index("ix_Student_School_id") and not plan.has_full_scan()
+    plan = await Student.filter(School.name == "school 1").explain()
+    assert plan.has_full_scan(School.tablename) and plan.uses_index()
+    assert (await User.select().values(User.id, flatten=True).explain()).nodes
+    assert (await User.select().value_dict(User.name).explain()).has_full_scan()
+    plan = await User.filter(name="a").coalesce(User.name, User.introduce).explain()
+    assert not plan.has_full_scan() and "SEARCH" in str(plan)
+
+    # parameters go through the bind processors of their types
+    await JsonModel(data=Data(a="123", b="b"), lst=[], dic={}).insert()
+    plan = await JsonModel.filter(JsonModel.data.a == "123").explain()
+    assert plan.has_full_scan(JsonModel.tablename)
+    await Event(name="event", day=date(2024, 1, 1)).insert()
+    plan = await Event.filter(Event.day >= date(2024, 1, 1)).explain()
+    assert plan.has_full_scan(Event.tablename)
+    assert await Event.filter(Event.day >= date(2024, 1, 1)).count() == 1
+
+    with pytest.raises(cherry.exception.DialectNotSupportedError):
+        await User.select().explain(analyze=True)
+
+
+@pytest.mark.asyncio
+async def test_values_columns():
+    await User.insert_many(
+        *(
+            User(id=i, name=f"user {i}", introduce="", age=i, money=i / 2)
+            for i in range(1, 2501)
+        ),
+    )
+
+    columns = (
+        await User.filter(User.age > 500)
+        .order_by(User.id)
+        .values(User.id, User.name, User.money)
+        .columns()
+    )
+    assert list(columns) == ["id", "name", "money"]
+    assert columns["id"].typecode == "q" and columns["money"].typecode == "d"
+    assert list(columns["id"]) == list(range(501, 2501))
+    assert columns["name"][:2] == ["user 501", "user 502"]
+    assert columns["money"][-1] == 1250.0
+
+    columns = await User.select().values(User.id).columns()
+    assert len(columns["id"]) == 2500
+    columns = await User.filter(User.age > 3000).values(User.id, User.age).columns()
+    assert len(columns["id"]) == 0 and len(columns["age"]) == 0
+    # NULL values turn a numeric column into a list
+    queryset = User.filter(User.age < 4).order_by(User.id)
+    columns = await queryset.values(func.nullif(User.age, 2).label("age")).columns()
+    assert columns["age"] == [1, None, 3]
+
+    # columns of the same name are labeled like value_dict does
+    school = await School(name="school 1").insert()
+    await Student(name="student 1", school=school).insert()
+    queryset = Student.filter(School.name == "school 1")
+    columns = await queryset.values(Student.name, School.name).columns()
+    assert columns == {"name": ["student 1"], "name_1": ["school 1"]}
+    assert list(columns) == list(
+        (await queryset.value_dict(Student.name, School.name).get()),
+    )
+
+
+@pytest.mark.asyncio
+async def test_as_records():
+    await User.insert_many(
+        *(User(id=i, name=f"user {i}", introduce="", age=i) for i in range(1, 11)),
+    )
+    school = await School(name="school 1").insert()
+    await Student(name="student 1", school=school).insert()
+
+    users = await User.filter(User.age > 5).order_by(User.id).as_records().all()
+    models = await User.filter(User.age > 5).order_by(User.id).all()
+    assert [user._asdict() for user in users] == [
+        model.model_dump() for model in models
+    ]
+    assert isinstance(users[0], cherry.Record) and not hasattr(users[0], "__dict__")
+    assert users[0] == users[0] and users[0] != users[1]
+
+    user = await User.filter(name="user 3").as_records().get()
+    assert (user.id, user.name, user.age) == (3, "user 3", 3)
+    user = await User.filter(id=4).only(User.name).as_records().first()
+    assert user.name == "user 4" and user.id == 4 and not hasattr(user, "age")
+    student = await Student.select().as_records().get()
+    assert student.name == "student 1" and student.School_id == school.id
+
+    queryset = User.select().order_by(User.id).as_records()
+    users, total = await queryset.paginate_with_total(2, 3)
+    assert [user.id for user in users] == [4, 5, 6] and total == 10
+    assert len(await User.select().as_records().sample(4)) == 4
+
+
+@pytest.mark.asyncio
+async def test_to_json():
+    school = await School(name="school 1").insert()
+    await School(name="school 2").insert()
+    for i in range(3):
+        await Student(name=f"student {i}", school=school).insert()
+    post = await Post(title="post 1").insert()
+    await post.add(await Tag(name="tag 1").insert())
+    await JsonModel(data=Data(a="1", b="2"), lst=[1], dic={"a": {"b": "c"}}).insert()
+
+    for queryset in (
+        School.select().order_by(School.id),
+        School.select_related().order_by(School.id),
+        Student.select_related().order_by(Student.id),
+        Student.select().order_by(Student.id),
+        Post.select_related(),
+        Tag.select_related(),
+        JsonModel.select(),
+    ):
+        models = await queryset.all()
+        expected = [model.model_dump(mode="json") for model in models]
+        assert json.loads(await queryset.to_json()) == expected
+        chunks = [chunk async for chunk in queryset.stream_json(batch_size=2)]
+        lines = b"".join(chunks).splitlines()
+        assert [json.loads(line) for line in lines] == expected
+
+    data = json.loads(await Student.filter(id=1).only(Student.name).to_json())
+    assert data == [{"id": 1, "name": "student 0", "school": None}]
+
+    # a stream closed early releases the shared connection and commits
+    # the writes done while it was open
+    stream = Student.select().order_by(Student.id).stream_json(batch_size=1)
+    async for _ in stream:
+        await School(name="school 3").insert()
+        break
+    await stream.aclose()
+    assert School.database._counter == 0
+    await School(name="school 4").insert()
+    assert School.database._connect is None
+    names = await School.select().order_by(School.id).values(School.name).all()
+    assert [name for (name,) in names][-2:] == ["school 3", "school 4"]
+
+
+@pytest.mark.asyncio
+async def test_batch_validation():
+    school = await School(name="school 1").insert()
+    for i in range(3):
+        await Student(name=f"student {i}", school=school if i else None).insert()
+
+    students = await Student.select().order_by(Student.id).all()
+    assert [s._cherry_foreign_key_values_["School_id"] for s in students] == [
+        None,
+        school.id,
+        school.id,
+    ]
+    await students[1].fetch_related(Student.school)
+    assert students[1].school == school
+
+    students = await Student.select().only(Student.name).order_by(Student.id).all()
+    assert [s.name for s in students] == ["student 0", "student 1", "student 2"]
+    assert students[2]._cherry_foreign_key_values_ == {}
+    with pytest.raises(ValidationError):
+        Student.parse_many_from_db_dict([{"id": 1, "name": None, "School_id": None}])
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("offload", ["yield", "thread"])
+async def test_hydration_in_chunks(monkeypatch: pytest.MonkeyPatch, offload: str):
+    assert User.__meta__.hydration_chunk_size == 2000
+    monkeypatch.setattr(User.__meta__, "hydration_chunk_size", 7)
+    monkeypatch.setattr(User.__meta__, "hydration_offload", offload)
+    await User.insert_many(
+        *(User(id=i, name=f"user {i}", introduce="", age=i) for i in range(1, 51)),
+    )
+
+    users = await User.select().order_by(User.id).all()
+    assert [user.id for user in users] == list(range(1, 51))
+    users, total = await User.select().order_by(User.id).paginate_with_total(2, 20)
+    assert [user.id for user in users] == list(range(21, 41)) and total == 50
+    assert len(await User.sample(30)) == 30
+
+
+@pytest.mark.asyncio
+async def test_lazy_related(monkeypatch: pytest.MonkeyPatch):
+    schools = [await School(name=f"school {i}").insert() for i in range(3)]
+    for i in range(6):
+        await Student(name=f"student {i}", school=schools[i % 3]).insert()
+    statements = []
+
+    def count_statement(*args):
+        statements.append(args[2])
+
+    engine = Student.database._engine.sync_engine
+    event.listen(engine, "before_cursor_execute", count_statement)
+    try:
+        students = await Student.select().order_by(Student.id).lazy_related().all()
+        assert students[0].school is None and len(statements) == 1
+        assert await students[0].load(Student.school) == schools[0]
+        assert len(statements) == 2
+        assert [await student.load("school") for student in students] == schools * 2
+        assert len(statements) == 2
+
+        student = await Student.get(name="student 1")
+        assert await student.load(Student.school) == schools[1]
+        assert len(statements) == 4
+
+        loaded = await School.select().order_by(School.id).lazy_related().all()
+        counts = [len(await school.load(School.students)) for school in loaded]
+        assert counts == [2, 2, 2]
+        assert len(statements) == 6
+
+        # a result hydrated in chunks still loads its relations at once
+        monkeypatch.setattr(Student.__meta__, "hydration_chunk_size", 4)
+        students = await Student.select().order_by(Student.id).lazy_related().all()
+        statements.clear()
+        assert [await student.load(Student.school) for student in students] == (
+            schools * 2
+        )
+        assert len(statements) == 1
+    finally:
+        event.remove(engine, "before_cursor_execute", count_statement)
+
+    with pytest.raises(cherry.exception.FieldTypeError):
+        await student.load(School.students)
+    with pytest.raises(cherry.exception.RelatedFieldMissingError):
+        await Student(name="student").load(Student.school)
+
+
+@pytest.mark.asyncio
+async def test_many_to_many_bulk():
+    post1 = await Post(title="post 1").insert()
+    post2 = await Post(title="post 2").insert()
+    tags = [await Tag(name=f"tag {i}").insert() for i in range(5)]
+
+    async def linked_tags(post: Post) -> list[str]:
+        post = await Post.filter(id=post.id).prefetch_related().get()
+        return sorted(tag.name for tag in post.tags)
+
+    await post1.add_many(*tags[:3])
+    await post1.add_many(tags[1], tags[3])
+    await post2.add(tags[0])
+    assert [tag.name for tag in post1.tags] == ["tag 0", "tag 1", "tag 2", "tag 3"]
+    assert await linked_tags(post1) == ["tag 0", "tag 1", "tag 2", "tag 3"]
+
+    # only the given links of post1 are removed
+    await post1.remove(tags[0])
+    await post1.remove_many(tags[2], tags[4])
+    assert [tag.name for tag in post1.tags] == ["tag 1", "tag 3"]
+    assert await linked_tags(post1) == ["tag 1", "tag 3"]
+    assert await linked_tags(post2) == ["tag 0"]
+
+    await post1.set_related(Post.tags, [tags[3], tags[4]])
+    assert [tag.name for tag in post1.tags] == ["tag 3", "tag 4"]
+    assert await linked_tags(post1) == ["tag 3", "tag 4"]
+    await post2.set_related("tags", [])
+    assert await linked_tags(post2) == []
+
+    with pytest.raises(cherry.exception.FieldTypeError):
+        await post1.set_related(Post.title, [])
+    with pytest.raises(cherry.exception.RelationSolveError):
+        await post1.add_many(tags[0], post2)
+    with pytest.raises(cherry.exception.RelatedFieldMissingError):
+        await Post(title="post 3").add_many(tags[0])
+
+
+@pytest.mark.asyncio
+async def test_hydration_yields_between_chunks(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(Student.__meta__, "hydration_chunk_size", 5)
+    school = School(id=1, name="school")
+    await school.insert()
+    await Student.insert_many(
+        *(Student(id=i, name=f"student {i}", school=school) for i in range(1, 13)),
+    )
+    steps: list[str] = []
+
+    def record(name, method):
+        def wrapper(self, *args, **kwargs):
+            steps.append(name)
+            return method(self, *args, **kwargs)
+
+        return wrapper
+
+    async def fetch_related(self, conn, datas):
+        steps.append("related")
+        await fetch_many_related(self, conn, datas)
+
+    fetch_many_related = QuerySet._fetch_many_related
+    monkeypatch.setattr(QuerySet, "_map_rows", record("map", QuerySet._map_rows))
+    monkeypatch.setattr(
+        QuerySet,
+        "_parse_models",
+        record("parse", QuerySet._parse_models),
+    )
+    monkeypatch.setattr(QuerySet, "_fetch_many_related", fetch_related)
+
+    async def tick():
+        while True:
+            steps.append("tick")
+            await asyncio.sleep(0)
+
+    ticker = asyncio.create_task(tick())
+    await asyncio.sleep(0)
+    try:
+        students = await Student.select_related().order_by(Student.id).all()
+    finally:
+        ticker.cancel()
+    assert [s.id for s in students] == list(range(1, 13))
+    assert all(s.school.name == "school" for s in students)
+    # each chunk is mapped, given its relations and parsed on its own,
+    # and the ticker runs after every step
+    work = [step for step in steps if step != "tick"]
+    assert work == ["map", "related", "parse"] * 3
+    for i, step in enumerate(steps[:-1]):
+        if step != "tick":
+            assert steps[i + 1] == "tick"
@@ -0,0 +1,180 @@
+import cherry.exception
+from cherry.fields.utils import get_fields_validator
+import cherry.models.models as models_module
+from tests.models import Task, User
+
+import pytest
+from sqlalchemy import event
+
+
+@pytest.mark.asyncio
+async def test_update_with_expression():
+    users = [
+        User(id=i, name=f"user {i}", introduce="", age=i * 5, money=i * 100.0)
+        for i in range(1, 4)
+    ]
+    await User.insert_many(*users)
+
+    assert await User.select().update(money=User.money + 10) == 3
+    assert await User.select().values(User.money, flatten=True).all() == [
+        110.0,
+        210.0,
+        310.0,
+    ]
+
+    user = users[0]
+    await user.update(age=User.age * 2, introduce="hello")
+    assert user.age == 10 and user.introduce == "hello"
+    assert (await User.get(id=1)).age == 10
+
+    with pytest.raises(ValueError):
+        await user.update(unknown=User.age + 1)
+
+
+@pytest.mark.asyncio
+async def test_queryset_update():
+    users = [
+        User(id=i, name=f"user {i}", introduce="", age=i * 5, money=i * 100.0)
+        for i in range(1, 6)
+    ]
+    await User.insert_many(*users)
+
+    assert await User.filter(User.age > 15).update(introduce="old") == 2
+    assert await User.filter(introduce="old").values(User.id, flatten=True).all() == [
+        4,
+        5,
+    ]
+
+    updated = await User.filter(User.age <= 10).update(returning=True, age=50)
+    assert [u.id for u in updated] == [1, 2]
+    assert all(u.age == 50 for u in updated)
+
+    dialect = User.database.engine.dialect
+    dialect.update_returning = False
+    try:
+        updated = await User.filter(User.age == 50).update(returning=True, age=60)
+    finally:
+        dialect.update_returning = True
+    assert [u.id for u in updated] == [1, 2]
+    assert all(u.age == 60 for u in updated)
+
+    assert get_fields_validator(User, frozenset({"age"})) is get_fields_validator(
+        User,
+        frozenset({"age"}),
+    )
+
+
+@pytest.mark.asyncio
+async def test_update_many():
+    users = [
+        User(id=i, name=f"user {i}", introduce="", age=i * 5, money=i * 100.0)
+        for i in range(1, 6)
+    ]
+    await User.insert_many(*users)
+
+    for user in users:
+        user.age += 1
+        user.introduce = "changed"
+    assert await User.update_many(*users[:4], fields=["age"], batch_size=3) == 4
+    ages = await User.select().values(User.age, flatten=True).all()
+    assert ages == [6, 11, 16, 21, 25]
+    assert await User.filter(introduce="changed").count() == 0
+
+    assert await User.update_many(*users) == 5
+    assert await User.filter(introduce="changed").count() == 5
+    assert [u.money for u in await User.select().order_by(User.id).all()] == [
+        100.0,
+        200.0,
+        300.0,
+        400.0,
+        500.0,
+    ]
+
+    # each batch is one statement, so the count does not rely on executemany
+    statements = []
+
+    def count_statement(*args):
+        statements.append(args[2])
+
+    engine = User.database._engine.sync_engine
+    max_bind_params = models_module.MAX_BIND_PARAMS
+    event.listen(engine, "before_cursor_execute", count_statement)
+    try:
+        assert await User.update_many(*users, fields=[User.money], batch_size=2) == 5
+        # 3 bind parameters a row, so a budget of 7 fits two rows a statement
+        models_module.MAX_BIND_PARAMS = 7
+        assert await User.update_many(*users, fields=[User.money]) == 5
+    finally:
+        models_module.MAX_BIND_PARAMS = max_bind_params
+        event.remove(engine, "before_cursor_execute", count_statement)
+    assert len(statements) == 6
+    assert all('CASE "User".id WHEN' in s for s in statements)
+
+    # the columns a partial model did not select are left as they are
+    partial = await User.only(User.name).order_by(User.id).all()
+    for user in partial:
+        user.name += " renamed"
+    assert await User.update_many(*partial) == 5
+    users = await User.select().order_by(User.id).all()
+    assert [(u.name, u.age) for u in users[:2]] == [
+        ("user 1 renamed", 6),
+        ("user 2 renamed", 11),
+    ]
+
+    with pytest.raises(cherry.exception.FieldTypeError):
+        await User.update_many(*users, fields=["id", "age"])
+
+
+@pytest.mark.asyncio
+async def test_queryset_update_in_batches():
+    users = [
+        User(id=i, name=f"user {i}", introduce="", age=i, money=i * 100.0)
+        for i in range(1, 11)
+    ]
+    await User.insert_many(*users)
+
+    progress = []
+    updated = await User.filter(User.age > 2).update(
+        batch_size=3,
+        progress=progress.append,
+        age=User.age + 100,
+    )
+    assert updated == 8
+    assert progress == [3, 6, 8]
+    assert await User.filter(User.age > 100).count() == 8
+
+    updated = await User.filter(User.age > 100).update(
+        returning=True,
+        batch_size=5,
+        introduce="batched",
+    )
+    assert [u.id for u in updated] == list(range(3, 11))
+
+
+@pytest.mark.asyncio
+async def test_update_fields_named_like_options():
+    await Task(name="a").insert()
+
+    # the options are ambiguous by keyword, the values are given as a dict
+    with pytest.raises(cherry.exception.FieldTypeError):
+        await Task.select().update(progress=50)
+    with pytest.raises(cherry.exception.FieldTypeError):
+        await Task.select().update(progress=50, name="b")
+    assert await Task.select().update({"progress": 50}, name="b") == 1
+    assert await Task.select().update({Task.progress: 60}, batch_size=10) == 1
+    updated = await Task.select().update({"returning": True}, returning=True)
+    assert [(t.name, t.progress, t.returning) for t in updated] == [("b", 60, True)]
+    with pytest.raises(ValueError):
+        await Task.select().update()
+
+
+@pytest.mark.asyncio
+async def test_model_update_field_named_returning():
+    task = await Task(name="a").insert()
+    with pytest.raises(cherry.exception.FieldTypeError):
+        await task.update(returning=True)
+    await task.update({"returning": True}, returning=True, progress=10)
+    assert (task.returning, task.progress) == (True, 10)
+    assert (await Task.get(id=task.id)).returning is True
+    await task.update({Task.progress: Task.progress + 5})
+    assert task.progress == 15